@@ -0,0 +1,124 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .metrics import ARTIFACT_EVICTIONS
+
+# Bump when the PDF/PNG layout changes so stale artifacts stop matching
+RENDER_VERSION = 2
+
+# kind -> (media subdirectory, file prefix, extension)
+ARTIFACT_KINDS = {
+    'daily_logs': ('daily_logs', 'daily_log', 'pdf'),
+    'eld_logs': ('eld_logs', 'eld_log', 'png'),
+}
+# Whole-trip PDFs kept by ``logs.pdf?persist=1``; evicted along with the per-day artifacts
+TRIP_LOGS_DIR = 'trip_logs'
+CACHE_DIRS = [subdir for subdir, _, _ in ARTIFACT_KINDS.values()] + [TRIP_LOGS_DIR]
+
+# Bytes under CACHE_DIRS, as last scanned plus what this process has written since
+_usage = {'bytes': None, 'scanned': 0.0}
+_usage_lock = threading.Lock()
+
+
+def artifact_key(timeline):
+    # The duty-status timeline is everything the renderers read
+    digest = hashlib.sha256(f'v{RENDER_VERSION}'.encode('utf-8'))
+    for array in (timeline.start, timeline.end, timeline.status, timeline.miles):
+        digest.update(np.round(array, 6).tobytes())
+    return digest.hexdigest()[:24]
+
+
+def artifact_path(kind, artifact_id, day):
+    subdir, prefix, ext = ARTIFACT_KINDS[kind]
+    return os.path.join(settings.MEDIA_ROOT, subdir, f'{prefix}_{artifact_id}_day_{day}.{ext}')
+
+
+def write_atomic(path, data):
+    # Readers of a shared key never see a half-written file
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def touch(path):
+    """True if ``path`` is on disk; refreshes its age for eviction."""
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def cached(kind, artifact_id, day):
+    """True if the artifact is already on disk; refreshes its age for eviction."""
+    return touch(artifact_path(kind, artifact_id, day))
+
+
+def record_write(path):
+    """Count a newly rendered artifact towards the size ``evict`` checks; returns its size."""
+    size = os.path.getsize(path)
+    with _usage_lock:
+        if _usage['bytes'] is not None:
+            _usage['bytes'] += size
+    return size
+
+
+def _scan():
+    files = []
+    for subdir in CACHE_DIRS:
+        directory = os.path.join(settings.MEDIA_ROOT, subdir)
+        if not os.path.isdir(directory):
+            continue
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.startswith('.tmp-'):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+    return files
+
+
+def evict(max_bytes=None):
+    """Delete least recently used artifacts until ``CACHE_DIRS`` fit in ``max_bytes``.
+
+    The directories are only scanned once the size tracked by ``record_write``
+    goes over the limit, or every ``ARTIFACT_RESCAN_INTERVAL`` seconds to pick
+    up what other processes wrote. Returns the number of files deleted.
+    """
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'ARTIFACT_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+    now = time.monotonic()
+    with _usage_lock:
+        tracked = _usage['bytes']
+        if tracked is not None and tracked <= max_bytes and now - _usage['scanned'] < getattr(settings, 'ARTIFACT_RESCAN_INTERVAL', 300):
+            return 0
+
+    files = sorted(_scan())
+    total = sum(size for _, size, _ in files)
+    deleted = 0
+    for _, size, path in files:
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        deleted += 1
+    with _usage_lock:
+        _usage.update(bytes=total, scanned=now)
+    if deleted:
+        ARTIFACT_EVICTIONS.inc(deleted)
+    return deleted
@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from .forms import TripForm
+from .geocoding import ageocode_tasks, expire_pending
+from .models import Trip
+from .planning import routes_from_geocodes, trip_result, trip_stops, trip_timeline
+from .rendering import trip_logs
+
+
+def _line(row):
+    return json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def _save_valid(rows):
+    # Validate every row and save the valid trips in one transaction; form lookups need the ORM
+    trips, errors = [], []
+    for index, row in enumerate(rows):
+        form = TripForm(row if isinstance(row, dict) else {})
+        if form.is_valid():
+            trips.append((index, form.save(commit=False), form.cleaned_data['stops'], form.cleaned_data['eld_format']))
+        else:
+            errors.append({'index': index, 'errors': {field: list(errors) for field, errors in form.errors.items()}})
+    if trips:
+        with transaction.atomic():
+            Trip.objects.bulk_create([trip for _, trip, _, _ in trips])
+    return trips, errors
+
+
+def _plan_routed(index, trip, route_stops, futures, eld_format):
+    # Route one trip from its finished lookups and build its line; CPU-bound, so it runs off the event loop
+    route_data = routes_from_geocodes([route_stops], futures)[0]
+    if 'error' in route_data:
+        return None, {'index': index, 'trip_id': trip.id, 'error': route_data['error']}
+    trip.total_distance = route_data['total_distance']
+    trip.total_time = route_data['total_time']
+    trip.route = route_data
+    timeline = trip_timeline(trip)
+    result = trip_result(trip, route_data, timeline)
+    result['daily_logs'], result['eld_logs'] = trip_logs(trip.id, timeline, eld_format)
+    return trip, dict(result, index=index)
+
+
+async def plan_batch(rows):
+    """Plan a batch of trips, yielding one NDJSON line per row as it finishes.
+
+    Every line carries the row's ``index``; a bad row gets an ``error`` (or form
+    ``errors``) line and never fails the rest of the batch. Valid trips are saved
+    in one transaction and each distinct address is geocoded once. At most
+    ``TRIP_BATCH_CONCURRENCY`` lookups, and trips being routed, run at once; a
+    trip is routed and sent as soon as its own lookups finish. Log artifacts
+    are linked, not rendered; each is rendered when first requested.
+
+    An async generator, so ASGI servers send each line as it is yielded instead
+    of buffering the whole response.
+    """
+    trips, errors = await sync_to_async(_save_valid)(rows)
+    for error in errors:
+        yield _line(error)
+    if not trips:
+        return
+
+    concurrency = getattr(settings, 'TRIP_BATCH_CONCURRENCY', 4)
+    timeout = getattr(settings, 'GEOCODE_BATCH_TIMEOUT', 120)
+    routes = [
+        trip_stops(trip.current_location, trip.pickup_location, trip.dropoff_location, stops)
+        for _, trip, stops, _ in trips
+    ]
+    lookups = ageocode_tasks([stop.address for route_stops in routes for stop in route_stops], concurrency)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    routing = asyncio.Semaphore(concurrency)
+    plan_routed = sync_to_async(_plan_routed, thread_sensitive=False)
+
+    async def plan(index, trip, route_stops, futures, eld_format):
+        # The whole batch shares one deadline for its lookups
+        _, pending = await asyncio.wait(set(futures), timeout=max(0, deadline - loop.time()))
+        futures = expire_pending(futures, pending, timeout)
+        async with routing:
+            return await plan_routed(index, trip, route_stops, futures, eld_format)
+
+    planned, position = [], 0
+    for (index, trip, _, eld_format), route_stops in zip(trips, routes):
+        futures = lookups[position:position + len(route_stops)]
+        position += len(route_stops)
+        planned.append(asyncio.ensure_future(plan(index, trip, route_stops, futures, eld_format)))
+    try:
+        for next_planned in asyncio.as_completed(planned):
+            trip, line = await next_planned
+            if trip is not None:
+                await trip.asave(update_fields=['total_distance', 'total_time', 'route'])
+            yield _line(line)
+    finally:
+        # Stop any work left behind when the client goes away mid-stream
+        for task in planned + lookups:
+            task.cancel()
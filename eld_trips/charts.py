@@ -0,0 +1,91 @@
+import io
+import threading
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# Rows of the ELD chart, bottom to top
+DUTY_STATUSES = ['Off Duty', 'Sleeper', 'Driving', 'On Duty']
+
+# How ELD logs are returned: a rendered PNG URL, an inline SVG string, or the raw segments
+ELD_FORMATS = ['png', 'svg', 'json']
+
+# SVG chart layout, in px
+_SVG_LEFT, _SVG_TOP, _SVG_HOUR, _SVG_ROW = 64, 24, 20, 28
+
+_local = threading.local()
+
+
+class EldChartRenderer:
+    """ELD step chart built once with its static axes; each render only swaps the line data.
+
+    Uses the object-oriented Figure/Agg API, so there is no global pyplot state and
+    every thread can own its own renderer.
+    """
+
+    def __init__(self):
+        self.figure = Figure(figsize=(10, 4))
+        FigureCanvasAgg(self.figure)
+        ax = self.figure.add_subplot()
+        ax.set_yticks(range(len(DUTY_STATUSES)), DUTY_STATUSES)
+        ax.set_ylim(-0.5, len(DUTY_STATUSES) - 0.5)
+        ax.set_xticks(range(0, 25, 2))
+        ax.set_xlabel('Hours')
+        ax.grid(True, linewidth=0.3)
+        self.axes = ax
+        self.line, = ax.plot([], [], drawstyle='steps-post')
+        self.title = ax.set_title('')
+
+    def render(self, day, times, statuses):
+        rows = [DUTY_STATUSES.index(status) for status in statuses]
+        self.line.set_data(times, rows)
+        self.axes.set_xlim(0, max(24, times[-1]))
+        self.title.set_text(f'ELD Log - Day {day}')
+        buffer = io.BytesIO()
+        self.figure.canvas.print_png(buffer)
+        return buffer.getvalue()
+
+
+def get_eld_renderer():
+    renderer = getattr(_local, 'renderer', None)
+    if renderer is None:
+        renderer = _local.renderer = EldChartRenderer()
+    return renderer
+
+
+def render_eld_svg(day, segments):
+    """ELD step chart for one day as a standalone SVG string, built by hand without matplotlib.
+
+    ``segments`` are ``(start, end, status)`` in hours of the day.
+    """
+    rows = len(DUTY_STATUSES)
+    width, height = _SVG_LEFT + 24 * _SVG_HOUR + 8, _SVG_TOP + rows * _SVG_ROW + 20
+
+    def x(hour):
+        return f'{_SVG_LEFT + hour * _SVG_HOUR:.1f}'.rstrip('0').rstrip('.')
+
+    def y(status):
+        return _SVG_TOP + (rows - 1 - status) * _SVG_ROW + _SVG_ROW // 2
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" font-family="sans-serif" font-size="11">',
+        f'<text x="{width // 2}" y="15" text-anchor="middle">ELD Log - Day {day}</text>',
+        '<g stroke="#ccc" stroke-width="0.5"><path d="'
+        + ''.join(f'M{x(hour)} {_SVG_TOP}V{_SVG_TOP + rows * _SVG_ROW}' for hour in range(25))
+        + ''.join(f'M{_SVG_LEFT} {_SVG_TOP + row * _SVG_ROW}H{x(24)}' for row in range(rows + 1))
+        + '"/></g>',
+    ]
+    parts += [
+        f'<text x="{_SVG_LEFT - 4}" y="{y(status) + 4}" text-anchor="end">{name}</text>'
+        for status, name in enumerate(DUTY_STATUSES)
+    ]
+    parts += [
+        f'<text x="{x(hour)}" y="{height - 6}" text-anchor="middle">{hour}</text>' for hour in range(0, 25, 2)
+    ]
+    if segments:
+        path = [f'M{x(segments[0][0])} {y(segments[0][2])}']
+        for start, end, status in segments:
+            path.append(f'V{y(status)}H{x(end)}')
+        parts.append(f'<path d="{"".join(path)}" fill="none" stroke="#1f77b4" stroke-width="2"/>')
+    parts.append('</svg>')
+    return ''.join(parts)
@@ -0,0 +1,110 @@
+"""Rolling 70-hr/8-day cycle from a driver's recorded duty log.
+
+``record_duty`` appends an event to the log and folds it into per-day
+``DutyDay`` totals, so ``cycle_hours_used`` reads at most eight of those rows
+plus the events of the day asked about, however long the driver's history.
+Days are calendar days in ``TIME_ZONE``, the home terminal's time.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .hos import DRIVING, ON_DUTY, RESTART_LENGTH
+from .models import Driver, DutyDay, DutyEvent
+
+CYCLE_DAYS = 8
+_RESTART = timedelta(hours=RESTART_LENGTH)
+
+
+def _midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _hours(delta):
+    return delta.total_seconds() / 3600
+
+
+def _day_pieces(started_at, ended_at):
+    # (date, start, end) for each calendar day the interval touches
+    pieces = []
+    start = started_at
+    while start < ended_at:
+        day = timezone.localdate(start)
+        end = min(ended_at, _midnight(day + timedelta(days=1)))
+        pieces.append((day, start, end))
+        start = end
+    return pieces
+
+
+def _update_day(driver, day, **changes):
+    DutyDay.objects.get_or_create(driver=driver, date=day)
+    DutyDay.objects.filter(driver=driver, date=day).update(**changes)
+
+
+def _rest(driver, start, end):
+    # Off-duty time, gaps in the log included, restarts the cycle once a run of it reaches 34 hrs
+    if driver.rest_started_at is None:
+        driver.rest_started_at = start
+    if start - driver.rest_started_at < _RESTART <= end - driver.rest_started_at:
+        _update_day(driver, timezone.localdate(driver.rest_started_at), restart_at=driver.rest_started_at)
+
+
+def record_duty(driver, status, started_at, ended_at):
+    """Append one duty-status event to a driver's log and update the daily totals.
+
+    Events must be recorded in time order; a gap since the previous event counts
+    as off duty. Returns the updated driver.
+    """
+    if ended_at <= started_at:
+        raise ValueError("A duty event must end after it starts.")
+    with transaction.atomic():
+        driver = Driver.objects.select_for_update().get(pk=driver.pk)
+        if driver.log_end is not None:
+            if started_at < driver.log_end:
+                raise ValueError(f"Duty events must be recorded in order; the log ends at {driver.log_end.isoformat()}.")
+            if started_at > driver.log_end:
+                _rest(driver, driver.log_end, started_at)
+
+        pieces = _day_pieces(started_at, ended_at)
+        DutyEvent.objects.bulk_create([
+            DutyEvent(driver=driver, status=status, started_at=start, ended_at=end) for _, start, end in pieces
+        ])
+        if status in (DRIVING, ON_DUTY):
+            for day, start, end in pieces:
+                _update_day(driver, day, on_duty_hours=F('on_duty_hours') + _hours(end - start))
+            driver.rest_started_at = None
+        else:
+            _rest(driver, started_at, ended_at)
+
+        driver.log_end = ended_at
+        driver.save(update_fields=['log_end', 'rest_started_at'])
+    return driver
+
+
+def cycle_hours_used(driver, at=None):
+    """On-duty hours in the 8 days up to ``at`` (default now), counted from the last 34-hr restart.
+
+    Time after the end of the log counts as off duty, as a gap between events does.
+    """
+    at = at or timezone.now()
+    if driver.log_end is not None and at > driver.log_end:
+        if at - (driver.rest_started_at or driver.log_end) >= _RESTART:
+            return 0.0  # the open off-duty run is already a restart
+    today = timezone.localdate(at)
+    days = list(
+        DutyDay.objects
+        .filter(driver=driver, date__gt=today - timedelta(days=CYCLE_DAYS), date__lte=today)
+        .values_list('date', 'on_duty_hours', 'restart_at')
+    )
+    # A restart's own day only has on-duty time from before the rest began
+    restarts = [restart_at for _, _, restart_at in days if restart_at and restart_at + _RESTART <= at]
+    after = timezone.localdate(max(restarts)) if restarts else None
+    used = sum((hours for date, hours, _ in days if date < today and (after is None or date > after)), 0.0)
+
+    # Today only up to ``at``, from its events; they never start before midnight
+    events = DutyEvent.objects.filter(
+        driver=driver, status__in=(DRIVING, ON_DUTY), started_at__gte=_midnight(today), started_at__lt=at,
+    ).values_list('started_at', 'ended_at')
+    return used + sum(_hours(min(ended_at, at) - started_at) for started_at, ended_at in events)
@@ -1,7 +1,97 @@
 from django import forms
-from .models import Trip
+from django.conf import settings
+from .charts import ELD_FORMATS
+from .cycle import cycle_hours_used
+from .history import decode_cursor
+from .hos import CYCLE_LIMIT
+from .models import Driver, DutyEvent, Trip
+
+
+class EldFormatMixin(forms.Form):
+    eld_format = forms.ChoiceField(choices=[(name, name) for name in ELD_FORMATS], required=False)
+
+    def clean_eld_format(self):
+        return self.cleaned_data['eld_format'] or getattr(settings, 'ELD_LOG_FORMAT', 'png')
+
+
+class DriverCycleMixin(forms.Form):
+    # With a driver, cycle_used may be left out and is read from their duty log
+    driver = forms.ModelChoiceField(queryset=Driver.objects.all(), required=False)
+    cycle_used = forms.FloatField(min_value=0, max_value=CYCLE_LIMIT, required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('cycle_used') is None and 'cycle_used' not in self.errors:
+            if cleaned_data.get('driver') is None:
+                self.add_error('cycle_used', self.fields['cycle_used'].error_messages['required'])
+            else:
+                cleaned_data['cycle_used'] = cycle_hours_used(cleaned_data['driver'])
+        return cleaned_data
+
+
+class TripForm(DriverCycleMixin, EldFormatMixin, forms.ModelForm):
+    stops = forms.JSONField(required=False)  # extra addresses visited between pickup and dropoff
 
-class TripForm(forms.ModelForm):
     class Meta:
         model = Trip
-        fields = ['current_location', 'pickup_location', 'dropoff_location', 'cycle_used']
+        fields = ['current_location', 'pickup_location', 'dropoff_location', 'cycle_used', 'driver']
+
+    def clean_stops(self):
+        stops = self.cleaned_data['stops'] or []
+        if not isinstance(stops, list) or not all(isinstance(stop, str) and stop.strip() for stop in stops):
+            raise forms.ValidationError("Enter a list of addresses.")
+        max_stops = getattr(settings, 'TRIP_MAX_STOPS', 50)
+        if len(stops) > max_stops:
+            raise forms.ValidationError(f"At most {max_stops} stops are allowed.")
+        return [stop.strip() for stop in stops]
+
+
+class MultiStopTripForm(DriverCycleMixin, EldFormatMixin, forms.Form):
+    current_location = forms.CharField(max_length=200)
+    shipments = forms.JSONField()  # [{"pickup": address, "dropoff": address}, ...]
+
+    def clean_shipments(self):
+        shipments = self.cleaned_data['shipments']
+        if not isinstance(shipments, list) or not shipments or not all(
+            isinstance(shipment, dict)
+            and all(isinstance(shipment.get(key), str) and 0 < len(shipment[key].strip()) <= 200 for key in ('pickup', 'dropoff'))
+            for shipment in shipments
+        ):
+            raise forms.ValidationError("Enter a list of shipments, each with a pickup and a dropoff address.")
+        max_stops = getattr(settings, 'TRIP_MAX_STOPS', 50)
+        if len(shipments) * 2 > max_stops:
+            raise forms.ValidationError(f"At most {max_stops // 2} shipments are allowed.")
+        return [{'pickup': shipment['pickup'].strip(), 'dropoff': shipment['dropoff'].strip()} for shipment in shipments]
+
+
+class DriverForm(forms.ModelForm):
+    class Meta:
+        model = Driver
+        fields = ['name']
+
+
+class DutyEventForm(forms.ModelForm):
+    class Meta:
+        model = DutyEvent
+        fields = ['status', 'started_at', 'ended_at']
+
+
+class TripHistoryForm(forms.Form):
+    since = forms.DateTimeField(required=False)
+    until = forms.DateTimeField(required=False)
+    location = forms.CharField(max_length=200, required=False)  # substring of any of the trip's addresses
+    cursor = forms.CharField(required=False)  # next_cursor of the previous page
+    limit = forms.IntegerField(min_value=1, required=False)
+
+    def clean_cursor(self):
+        cursor = self.cleaned_data['cursor']
+        if not cursor:
+            return None
+        try:
+            return decode_cursor(cursor)
+        except ValueError:
+            raise forms.ValidationError("Invalid cursor.")
+
+    def clean_limit(self):
+        limit = self.cleaned_data['limit'] or getattr(settings, 'TRIP_HISTORY_PAGE_SIZE', 50)
+        return min(limit, getattr(settings, 'TRIP_HISTORY_MAX_PAGE_SIZE', 200))
@@ -0,0 +1,179 @@
+"""Offline geocoding from a local gazetteer of US cities and ZIP centroids.
+
+The gazetteer is a read-only SQLite file built by ``manage.py build_gazetteer``
+from a CSV with ``name,state,latitude,longitude`` columns and optional
+``kind`` (``city`` or ``zip``) and ``population``. Only queries naming a
+place are answered: a ZIP code, or a city and state optionally followed by a
+ZIP. Street addresses return None, so they go on to the remote geocoder.
+Lookups try, in order: the trailing ZIP code, the normalized ``"city, st"``
+key, a bare city name, and finally an FTS5 trigram search for misspellings.
+"""
+import csv
+import re
+import sqlite3
+import threading
+from difflib import SequenceMatcher
+from pathlib import Path
+
+from .geocoding import GeocodeResult, normalize_address
+
+STATES = {
+    'alabama': 'al', 'alaska': 'ak', 'arizona': 'az', 'arkansas': 'ar', 'california': 'ca',
+    'colorado': 'co', 'connecticut': 'ct', 'delaware': 'de', 'district of columbia': 'dc',
+    'florida': 'fl', 'georgia': 'ga', 'hawaii': 'hi', 'idaho': 'id', 'illinois': 'il',
+    'indiana': 'in', 'iowa': 'ia', 'kansas': 'ks', 'kentucky': 'ky', 'louisiana': 'la',
+    'maine': 'me', 'maryland': 'md', 'massachusetts': 'ma', 'michigan': 'mi', 'minnesota': 'mn',
+    'mississippi': 'ms', 'missouri': 'mo', 'montana': 'mt', 'nebraska': 'ne', 'nevada': 'nv',
+    'new hampshire': 'nh', 'new jersey': 'nj', 'new mexico': 'nm', 'new york': 'ny',
+    'north carolina': 'nc', 'north dakota': 'nd', 'ohio': 'oh', 'oklahoma': 'ok', 'oregon': 'or',
+    'pennsylvania': 'pa', 'rhode island': 'ri', 'south carolina': 'sc', 'south dakota': 'sd',
+    'tennessee': 'tn', 'texas': 'tx', 'utah': 'ut', 'vermont': 'vt', 'virginia': 'va',
+    'washington': 'wa', 'west virginia': 'wv', 'wisconsin': 'wi', 'wyoming': 'wy',
+}
+_ABBREVIATIONS = set(STATES.values())
+_COUNTRY_SUFFIXES = ('usa', 'us', 'united states', 'united states of america')
+_ZIP = re.compile(r'\b(\d{5})(?:-\d{4})?$')  # only at the end, so a house number is never taken for one
+
+_SCHEMA = """
+CREATE TABLE places (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    display TEXT NOT NULL,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    population INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX places_key ON places (key);
+CREATE INDEX places_name_key ON places (name_key);
+CREATE VIRTUAL TABLE places_fts USING fts5(key, content='places', content_rowid='id', tokenize='trigram');
+"""
+
+
+def _split_state(text):
+    # "denver co" -> ["denver", "co"]; a trailing state name needs a city before it
+    words = text.split(' ')
+    for size in (3, 2, 1):
+        if len(words) > size:
+            tail = ' '.join(words[-size:])
+            if tail in STATES or (size == 1 and tail in _ABBREVIATIONS):
+                return [' '.join(words[:-size]), tail]
+    return [text]
+
+
+def _query_parts(query):
+    parts = normalize_address(query).split(', ')
+    if len(parts) > 1 and parts[-1] in _COUNTRY_SUFFIXES:
+        parts.pop()
+    return parts
+
+
+def place_key(query):
+    """Normalized ``"city, st"`` form of a query: full state names abbreviated, country and ZIP dropped."""
+    parts = _query_parts(query)
+    if len(parts) == 1:
+        parts = _split_state(_ZIP.sub('', parts[0]).strip())
+    if len(parts) > 1:
+        state = _ZIP.sub('', parts[-1]).strip()  # "il 60601" -> "il"
+        parts[-1] = STATES.get(state, state)
+    return ', '.join(parts)
+
+
+def build_gazetteer(source, path):
+    """Build the gazetteer database from a CSV file; returns the number of places."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    tmp_path.unlink(missing_ok=True)
+    connection = sqlite3.connect(tmp_path)
+    try:
+        connection.executescript(_SCHEMA)
+        with open(source, newline='', encoding='utf-8') as f:
+            rows = []
+            for row in csv.DictReader(f):
+                name, state = row['name'].strip(), row['state'].strip()
+                kind = (row.get('kind') or ('zip' if _ZIP.fullmatch(name) else 'city')).strip().lower()
+                if kind == 'zip':
+                    key = name_key = name
+                else:
+                    name_key = normalize_address(name)
+                    key = place_key(f"{name}, {state}")
+                rows.append((
+                    kind, key, name_key, f"{name}, {state.upper()}",
+                    float(row['latitude']), float(row['longitude']), int(float(row.get('population') or 0)),
+                ))
+        connection.executemany(
+            "INSERT INTO places (kind, key, name_key, display, latitude, longitude, population)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        connection.execute("INSERT INTO places_fts (rowid, key) SELECT id, key FROM places WHERE kind = 'city'")
+        connection.commit()
+        connection.execute("VACUUM")
+    finally:
+        connection.close()
+    tmp_path.replace(path)  # readers never see a half-built file
+    return len(rows)
+
+
+class GazetteerGeocoder:
+    def __init__(self, path, min_similarity=0.85, candidates=20):
+        self.path = Path(path)
+        self.min_similarity = min_similarity  # for fuzzy matches, 0..1
+        self.candidates = candidates
+        self._local = threading.local()
+
+    def _connection(self):
+        # sqlite3 connections are per thread; geocode_many looks up from a pool
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True)
+            self._local.connection = connection
+        return connection
+
+    def _first(self, sql, params):
+        row = self._connection().execute(sql + " ORDER BY population DESC LIMIT 1", params).fetchone()
+        return GeocodeResult(row[1], row[2], row[0]) if row else None
+
+    def geocode(self, query, **kwargs):
+        key = place_key(query)
+        parts = key.split(', ')
+        if len(parts) > 2 or any(char.isdigit() for char in key):
+            return None  # a street address; a city centroid would be the wrong answer for it
+        match = _ZIP.search(_query_parts(query)[-1])
+        if match:
+            result = self._first("SELECT display, latitude, longitude FROM places WHERE kind = 'zip' AND key = ?", (match.group(1),))
+            if result:
+                return result
+        if not key:
+            return None
+
+        result = self._first("SELECT display, latitude, longitude FROM places WHERE kind = 'city' AND key = ?", (key,))
+        if result:
+            return result
+        if len(parts) == 1:
+            result = self._first("SELECT display, latitude, longitude FROM places WHERE kind = 'city' AND name_key = ?", (key,))
+            if result:
+                return result
+        return self._fuzzy(key)
+
+    def _fuzzy(self, key):
+        trigrams = {key[i:i + 3] for i in range(len(key) - 2)}
+        if not trigrams:
+            return None
+        # Any shared trigram makes a candidate; bm25 ranks those sharing the most first
+        match = ' OR '.join('"' + trigram.replace('"', '""') + '"' for trigram in sorted(trigrams))
+        rows = self._connection().execute(
+            "SELECT places.key, name_key, display, latitude, longitude, population FROM places_fts"
+            " JOIN places ON places.id = places_fts.rowid"
+            " WHERE places_fts MATCH ? ORDER BY bm25(places_fts) LIMIT ?",
+            (match, self.candidates),
+        ).fetchall()
+        best, best_score = None, (self.min_similarity, 0)
+        for place, name, display, latitude, longitude, population in rows:
+            # A query without a state is compared with the bare city name
+            score = (SequenceMatcher(None, key, place if ', ' in key else name).ratio(), population)
+            if score >= best_score:
+                best, best_score = GeocodeResult(latitude, longitude, display), score
+        return best
@@ -0,0 +1,361 @@
+import asyncio
+import hashlib
+import os
+import re
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from collections import OrderedDict, namedtuple
+from contextvars import copy_context
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.utils import timezone
+from geopy.adapters import AioHTTPAdapter
+from geopy.geocoders import Nominatim
+
+from .metrics import record_event, timed
+from .models import GeocodeCacheEntry
+
+GeocodeResult = namedtuple('GeocodeResult', ['latitude', 'longitude', 'address'])
+
+_MISS = object()
+
+# A single upsert statement: concurrent lookups must not open competing
+# read-then-write transactions, which SQLite rejects as "database is locked"
+_UPSERT = {
+    'update_conflicts': True,
+    'unique_fields': ['query'],
+    'update_fields': ['found', 'latitude', 'longitude', 'address', 'expires_at', 'updated_at'],
+}
+
+
+def normalize_address(query):
+    # "  Chicago ,IL. " and "chicago, il" share one cache entry
+    query = query.lower().strip()
+    query = re.sub(r'\s*,\s*', ', ', query)
+    query = re.sub(r'\s+', ' ', query)
+    return query.strip(' ,.')
+
+
+class StubGeocoder:
+    """Offline geocoder returning deterministic coordinates, for tests and benchmarks."""
+
+    def __init__(self, places=None, latency=0.0):
+        self.places = {normalize_address(k): v for k, v in (places or {}).items()}
+        self.latency = latency
+        self.calls = 0
+
+    def geocode(self, query, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self._lookup(query)
+
+    async def ageocode(self, query, **kwargs):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._lookup(query)
+
+    def _lookup(self, query):
+        key = normalize_address(query)
+        if key in self.places:
+            coords = self.places[key]
+            if coords is None:
+                return None
+            return GeocodeResult(coords[0], coords[1], query)
+        if not key or 'unknown' in key:
+            return None
+        # Spread unknown names over the continental US so distances look plausible
+        digest = hashlib.sha1(key.encode('utf-8')).digest()
+        lat = 25 + (int.from_bytes(digest[:4], 'big') / 2**32) * 23
+        lon = -124 + (int.from_bytes(digest[4:8], 'big') / 2**32) * 57
+        return GeocodeResult(lat, lon, query)
+
+
+class FallbackGeocoder:
+    """Try each geocoder in turn; the first match wins."""
+
+    def __init__(self, *geocoders):
+        self.geocoders = geocoders
+
+    def geocode(self, query, **kwargs):
+        for geocoder in self.geocoders:
+            result = geocoder.geocode(query, **kwargs)
+            if result:
+                return result
+        return None
+
+    async def ageocode(self, query, **kwargs):
+        for geocoder in self.geocoders:
+            result = await ageocode(geocoder, query, **kwargs)
+            if result:
+                return result
+        return None
+
+
+class NominatimGeocoder:
+    """Nominatim with a non-blocking ``ageocode`` over aiohttp, when it is installed."""
+
+    def __init__(self, user_agent):
+        self.user_agent = user_agent
+        self.client = Nominatim(user_agent=user_agent)
+        self._async_clients = weakref.WeakKeyDictionary()  # aiohttp sessions belong to one event loop
+
+    def geocode(self, query, **kwargs):
+        return self.client.geocode(query, **kwargs)
+
+    async def ageocode(self, query, **kwargs):
+        if not AioHTTPAdapter.is_available:
+            return await asyncio.get_running_loop().run_in_executor(_executor, partial(self.geocode, query, **kwargs))
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._async_clients[loop] = Nominatim(user_agent=self.user_agent, adapter_factory=AioHTTPAdapter)
+        return await client.geocode(query, **kwargs)
+
+
+class CachedGeocoder:
+    """Geocoder wrapper with an in-process LRU in front of the shared DB cache."""
+
+    def __init__(self, geocoder, max_size=1024, ttl=30 * 24 * 3600, negative_ttl=3600):
+        self.geocoder = geocoder
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def geocode(self, query, **kwargs):
+        key = normalize_address(query)
+        result = self._get_memory(key)
+        if result is not _MISS:
+            record_event('geocode_cache', 'memory')
+            return result
+        result = self._get_db(key)
+        if result is not _MISS:
+            record_event('geocode_cache', 'db')
+            return result
+        record_event('geocode_cache', 'miss')
+
+        # Errors from the backend propagate and are never cached; only "no match" is
+        location = self.geocoder.geocode(query, **kwargs)
+        result = GeocodeResult(location.latitude, location.longitude, location.address) if location else None
+        self._store(key, result)
+        return result
+
+    async def ageocode(self, query, **kwargs):
+        key = normalize_address(query)
+        result = self._get_memory(key)
+        if result is not _MISS:
+            record_event('geocode_cache', 'memory')
+            return result
+        entry = await GeocodeCacheEntry.objects.filter(query=key).afirst()
+        result = await self._entry_result(key, entry)
+        if result is not _MISS:
+            record_event('geocode_cache', 'db')
+            return result
+        record_event('geocode_cache', 'miss')
+
+        location = await ageocode(self.geocoder, query, **kwargs)
+        result = GeocodeResult(location.latitude, location.longitude, location.address) if location else None
+        entry, expires_at = self._new_entry(key, result)
+        await GeocodeCacheEntry.objects.abulk_create([entry], **_UPSERT)
+        self._put_memory(key, result, expires_at.timestamp())
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+
+    def _get_memory(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return _MISS
+            result, expires_at = entry
+            if expires_at <= time.time():
+                del self._memory[key]
+                return _MISS
+            self._memory.move_to_end(key)
+            return result
+
+    def _put_memory(self, key, result, expires_at):
+        with self._lock:
+            self._memory[key] = (result, expires_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_size:
+                self._memory.popitem(last=False)
+
+    def _get_db(self, key):
+        entry = GeocodeCacheEntry.objects.filter(query=key).first()
+        if entry is None:
+            return _MISS
+        if entry.expires_at <= timezone.now():
+            entry.delete()
+            return _MISS
+        result = GeocodeResult(entry.latitude, entry.longitude, entry.address) if entry.found else None
+        self._put_memory(key, result, entry.expires_at.timestamp())
+        return result
+
+    async def _entry_result(self, key, entry):
+        # _get_db for an entry fetched with the async ORM
+        if entry is None:
+            return _MISS
+        if entry.expires_at <= timezone.now():
+            await entry.adelete()
+            return _MISS
+        result = GeocodeResult(entry.latitude, entry.longitude, entry.address) if entry.found else None
+        self._put_memory(key, result, entry.expires_at.timestamp())
+        return result
+
+    def _new_entry(self, key, result):
+        ttl = self.ttl if result is not None else self.negative_ttl
+        expires_at = timezone.now() + timedelta(seconds=ttl)
+        entry = GeocodeCacheEntry(
+            query=key,
+            found=result is not None,
+            latitude=result.latitude if result else None,
+            longitude=result.longitude if result else None,
+            address=result.address if result else '',
+            expires_at=expires_at,
+        )
+        return entry, expires_at
+
+    def _store(self, key, result):
+        entry, expires_at = self._new_entry(key, result)
+        GeocodeCacheEntry.objects.bulk_create([entry], **_UPSERT)
+        self._put_memory(key, result, expires_at.timestamp())
+
+
+_geocoder = None
+_geocoder_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='geocode')
+
+
+def build_backend():
+    backend = getattr(settings, 'GEOCODER', 'nominatim')
+    if backend == 'stub':
+        return StubGeocoder(latency=getattr(settings, 'GEOCODER_STUB_LATENCY', 0.0))
+    return NominatimGeocoder(user_agent="trip_planner")
+
+
+def get_geocoder():
+    # One cached client per process instead of a new Nominatim per request
+    global _geocoder
+    if _geocoder is None:
+        with _geocoder_lock:
+            if _geocoder is None:
+                _geocoder = CachedGeocoder(
+                    build_backend(),
+                    max_size=getattr(settings, 'GEOCODE_CACHE_SIZE', 1024),
+                    ttl=getattr(settings, 'GEOCODE_CACHE_TTL', 30 * 24 * 3600),
+                    negative_ttl=getattr(settings, 'GEOCODE_NEGATIVE_TTL', 3600),
+                )
+                gazetteer_path = getattr(settings, 'GAZETTEER_PATH', None)
+                if gazetteer_path and os.path.exists(gazetteer_path):
+                    from .gazetteer import GazetteerGeocoder
+
+                    # The local gazetteer answers first; only its misses reach the cache and remote backend
+                    _geocoder = FallbackGeocoder(
+                        GazetteerGeocoder(gazetteer_path, getattr(settings, 'GAZETTEER_MIN_SIMILARITY', 0.85)),
+                        _geocoder,
+                    )
+    return _geocoder
+
+
+def set_geocoder(geocoder):
+    # Swap the process-wide geocoder, e.g. for a StubGeocoder in tests
+    global _geocoder
+    with _geocoder_lock:
+        _geocoder = geocoder
+
+
+async def ageocode(geocoder, query, **kwargs):
+    # Backends without a native ageocode run on the lookup threads
+    if hasattr(geocoder, 'ageocode'):
+        return await geocoder.ageocode(query, **kwargs)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, copy_context().run, partial(geocoder.geocode, query, **kwargs))
+
+
+async def _timed_ageocode(geolocator, query):
+    with timed('geocode'):
+        return await ageocode(geolocator, query)
+
+
+def _timed_geocode(geolocator, query):
+    with timed('geocode'):
+        return geolocator.geocode(query)
+
+
+def geocode_many(queries, timeout=None):
+    """Geocode all queries concurrently; returns futures in the same order as ``queries``.
+
+    Duplicate addresses share one lookup. Lookups still running when the
+    deadline passes are reported as ``TimeoutError``.
+    """
+    geolocator = get_geocoder()
+    if timeout is None:
+        timeout = getattr(settings, 'GEOCODE_TIMEOUT', 10)
+    by_key = {}
+    for query in queries:
+        key = normalize_address(query)
+        if key not in by_key:
+            # Run in a copy of this request's context so the lookup is timed against it
+            by_key[key] = _executor.submit(copy_context().run, _timed_geocode, geolocator, query)
+    futures = [by_key[normalize_address(query)] for query in queries]
+    _, pending = wait(set(futures), timeout=timeout)
+    if pending:
+        expired = Future()
+        expired.set_exception(TimeoutError(f"timed out after {timeout}s"))
+        futures = [expired if future in pending else future for future in futures]
+    return futures
+
+
+async def _bounded_ageocode(semaphore, geolocator, query):
+    async with semaphore:
+        return await _timed_ageocode(geolocator, query)
+
+
+def ageocode_tasks(queries, concurrency=None):
+    """Start lookup tasks for ``queries``, in the same order; duplicates share one task.
+
+    At most ``concurrency`` lookups run at once when it is given.
+    """
+    geolocator = get_geocoder()
+    semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+    by_key = {}
+    for query in queries:
+        key = normalize_address(query)
+        if key not in by_key:
+            lookup = _bounded_ageocode(semaphore, geolocator, query) if semaphore else _timed_ageocode(geolocator, query)
+            by_key[key] = asyncio.ensure_future(lookup)
+    return [by_key[normalize_address(query)] for query in queries]
+
+
+def expire_pending(futures, pending, timeout):
+    """Cancel the ``pending`` lookups and report them as ``TimeoutError`` in ``futures``."""
+    if not pending:
+        return futures
+    for task in pending:
+        task.cancel()
+    expired = asyncio.get_running_loop().create_future()
+    expired.set_exception(TimeoutError(f"timed out after {timeout}s"))
+    return [expired if future in pending else future for future in futures]
+
+
+async def ageocode_many(queries, timeout=None, concurrency=None):
+    """``geocode_many`` for async views: lookups run as tasks on the event loop.
+
+    Returns done futures in query order; lookups past the deadline are
+    cancelled and reported as ``TimeoutError``.
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'GEOCODE_TIMEOUT', 10)
+    futures = ageocode_tasks(queries, concurrency)
+    _, pending = await asyncio.wait(set(futures), timeout=timeout)
+    return expire_pending(futures, pending, timeout)
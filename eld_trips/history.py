@@ -0,0 +1,57 @@
+"""Trip history reads: keyset-paginated pages of stored trips, newest first.
+
+A page is the next ``limit`` trips before the cursor's ``(created_at, id)``,
+read off the ``trip_created_at_id`` index, so a deep page costs the same as the
+first one. Rows carry the stored route; nothing is geocoded or rendered.
+"""
+import base64
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .models import Trip
+
+HISTORY_FIELDS = [
+    'id', 'kind', 'driver_id', 'current_location', 'pickup_location', 'dropoff_location',
+    'cycle_used', 'total_distance', 'total_time', 'created_at', 'route',
+]
+
+
+def encode_cursor(created_at, trip_id):
+    return base64.urlsafe_b64encode(f'{created_at.isoformat()}|{trip_id}'.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """``(created_at, id)`` of the last trip on the previous page; ValueError for a malformed cursor."""
+    text = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+    created_at, _, trip_id = text.partition('|')
+    created_at = parse_datetime(created_at)
+    if created_at is None:
+        raise ValueError("Invalid cursor")
+    return created_at, int(trip_id)
+
+
+def trip_history(since=None, until=None, location='', cursor=None, limit=50):
+    """One page of trips created in ``[since, until)`` with ``location`` in any of their addresses."""
+    trips = Trip.objects.order_by('-created_at', '-id')
+    if since:
+        trips = trips.filter(created_at__gte=since)
+    if until:
+        trips = trips.filter(created_at__lt=until)
+    if location:
+        trips = trips.filter(
+            Q(current_location__icontains=location)
+            | Q(pickup_location__icontains=location)
+            | Q(dropoff_location__icontains=location)
+        )
+    if cursor:
+        # (created_at, id) < cursor, with the created_at bound on its own so it can seek the index
+        created_at, trip_id = cursor
+        trips = trips.filter(created_at__lte=created_at).filter(Q(created_at__lt=created_at) | Q(id__lt=trip_id))
+
+    rows = list(trips.values(*HISTORY_FIELDS)[:limit + 1])
+    next_cursor = encode_cursor(rows[limit - 1]['created_at'], rows[limit - 1]['id']) if len(rows) > limit else None
+    return {
+        'results': [{'trip_id': row.pop('id'), **row} for row in rows[:limit]],
+        'next_cursor': next_cursor,
+    }
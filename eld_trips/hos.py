@@ -0,0 +1,202 @@
+"""Hours-of-service scheduling for property-carrying drivers.
+
+``plan_trip`` turns a route into a duty-status timeline once per trip; the log
+renderers and the compliance check all read from that timeline. Times are hours
+from midnight of the first log day.
+"""
+from collections import namedtuple
+from math import ceil
+
+import numpy as np
+
+OFF_DUTY, SLEEPER, DRIVING, ON_DUTY = 0, 1, 2, 3
+STATUS_NAMES = ['Off Duty', 'Sleeper', 'Driving', 'On Duty']
+
+DRIVING_LIMIT = 11  # hrs driving after 10 hrs off
+WINDOW_LIMIT = 14  # hrs after coming on duty in which driving is allowed
+BREAK_AFTER = 8  # hrs of driving before a 30 min interruption is required
+BREAK_LENGTH = 0.5
+RESET_LENGTH = 10  # off duty (spent in the sleeper berth) before a new shift
+CYCLE_LIMIT = 70  # on-duty hrs in 8 days
+RESTART_LENGTH = 34  # off duty hrs that restart the 70-hr cycle
+
+AVERAGE_SPEED = 50  # mph
+FUEL_INTERVAL = 1000  # miles between fuel stops
+FUEL_STOP = 0.5  # hrs on duty
+
+_EPSILON = 1e-9
+
+# Compact segment arrays: start/end hours, duty status code and miles driven
+Timeline = namedtuple('Timeline', ['start', 'end', 'status', 'miles', 'breaks', 'resets', 'restarts'])
+
+
+class _Schedule:
+    def __init__(self, cycle_used, start_hour):
+        self.segments = []
+        self.t = 0.0
+        self.cycle_hours = cycle_used
+        self.shift_start = None  # when the current 14-hr window opened
+        self.shift_driving = 0.0
+        self.driving_since_break = 0.0
+        self.miles_since_fuel = 0.0
+        self.breaks = self.resets = self.restarts = 0
+        if start_hour > 0:
+            self.add(OFF_DUTY, start_hour)
+
+    def add(self, status, hours, miles=0.0):
+        if hours <= _EPSILON:
+            return
+        end = self.t + hours
+        last = self.segments[-1] if self.segments else None
+        if last and last[2] == status:
+            self.segments[-1] = (last[0], end, status, last[3] + miles)
+        else:
+            self.segments.append((self.t, end, status, miles))
+        self.t = end
+
+    def work(self, status, hours, miles=0.0):
+        if self.shift_start is None:
+            self.shift_start = self.t
+        self.add(status, hours, miles)
+        self.cycle_hours += hours
+        if status == DRIVING:
+            self.shift_driving += hours
+            self.driving_since_break += hours
+        elif hours >= BREAK_LENGTH - _EPSILON:
+            self.driving_since_break = 0.0  # any 30 min without driving counts as the break
+
+    def rest(self, status, hours):
+        self.add(status, hours)
+        self.shift_start = None
+        self.shift_driving = self.driving_since_break = 0.0
+
+    def shift_elapsed(self):
+        return 0.0 if self.shift_start is None else self.t - self.shift_start
+
+    def restart(self):
+        self.rest(OFF_DUTY, RESTART_LENGTH)
+        self.cycle_hours = 0.0
+        self.restarts += 1
+
+    def drive(self, miles, speed):
+        remaining = miles
+        while remaining > _EPSILON:
+            if self.miles_since_fuel >= FUEL_INTERVAL - _EPSILON:
+                self.on_duty(FUEL_STOP)
+                self.miles_since_fuel = 0.0
+            if CYCLE_LIMIT - self.cycle_hours <= _EPSILON:
+                self.restart()
+            if (DRIVING_LIMIT - self.shift_driving <= _EPSILON
+                    or WINDOW_LIMIT - self.shift_elapsed() <= _EPSILON):
+                self.rest(SLEEPER, RESET_LENGTH)
+                self.resets += 1
+            if BREAK_AFTER - self.driving_since_break <= _EPSILON:
+                self.rest_break()
+
+            hours = min(
+                remaining / speed,
+                DRIVING_LIMIT - self.shift_driving,
+                WINDOW_LIMIT - self.shift_elapsed(),
+                BREAK_AFTER - self.driving_since_break,
+                CYCLE_LIMIT - self.cycle_hours,
+                (FUEL_INTERVAL - self.miles_since_fuel) / speed,
+            )
+            chunk = min(remaining, hours * speed)
+            self.work(DRIVING, hours, chunk)
+            self.miles_since_fuel += chunk
+            remaining -= chunk
+
+    def rest_break(self):
+        self.add(OFF_DUTY, BREAK_LENGTH)
+        self.driving_since_break = 0.0
+        self.breaks += 1
+
+    def on_duty(self, hours):
+        # On-duty time past the 70-hr limit needs a 34-hr restart first
+        if self.cycle_hours + hours > CYCLE_LIMIT + _EPSILON:
+            self.restart()
+        self.work(ON_DUTY, hours)
+
+
+def plan_trip(legs, cycle_used=0.0, start_hour=0.0, speed=AVERAGE_SPEED):
+    """Schedule a trip under the HOS rules.
+
+    ``legs`` is a sequence of ``(miles, stop_hours[, drive_hours])``: drive the
+    leg, then spend ``stop_hours`` on duty (pickup, dropoff). Without
+    ``drive_hours`` the leg is driven at ``speed``. Fuel stops, 30 min breaks, 10 hr
+    resets and 34 hr restarts are inserted as needed, and the last day is filled
+    with off duty time up to midnight.
+    """
+    schedule = _Schedule(cycle_used, start_hour)
+    for miles, stop_hours, *drive_hours in legs:
+        schedule.drive(miles, miles / drive_hours[0] if drive_hours and drive_hours[0] > 0 else speed)
+        schedule.on_duty(stop_hours)
+    schedule.add(OFF_DUTY, ceil(schedule.t / 24 - _EPSILON) * 24 - schedule.t)
+
+    segments = np.array(schedule.segments, dtype=np.float64).reshape(-1, 4)
+    return Timeline(
+        start=segments[:, 0],
+        end=segments[:, 1],
+        status=segments[:, 2].astype(np.int8),
+        miles=segments[:, 3],
+        breaks=schedule.breaks,
+        resets=schedule.resets,
+        restarts=schedule.restarts,
+    )
+
+
+def day_totals(timeline):
+    """Hours per duty status for each 24 hr log day, as an (n_days, 4) array, plus miles per day."""
+    n_days = max(1, ceil(timeline.end[-1] / 24 - _EPSILON)) if len(timeline.end) else 0
+    day_start = np.arange(n_days, dtype=np.float64)[:, None] * 24
+    # Overlap of every segment with every day, in hours
+    overlap = np.clip(
+        np.minimum(timeline.end[None, :], day_start + 24) - np.maximum(timeline.start[None, :], day_start), 0, None
+    )
+    hours = np.zeros((n_days, len(STATUS_NAMES)))
+    for status in range(len(STATUS_NAMES)):
+        hours[:, status] = overlap[:, timeline.status == status].sum(axis=1)
+    duration = timeline.end - timeline.start
+    miles = overlap @ np.divide(timeline.miles, duration, out=np.zeros_like(duration), where=duration > 0)
+    return hours, miles
+
+
+def log_days(timeline):
+    """Per-day summaries with the day's segments in hours of that day, for the log renderers."""
+    hours, miles = day_totals(timeline)
+    days = []
+    for index in range(len(hours)):
+        day_start = index * 24
+        mask = (timeline.end > day_start + _EPSILON) & (timeline.start < day_start + 24 - _EPSILON)
+        starts = np.maximum(timeline.start[mask], day_start) - day_start
+        ends = np.minimum(timeline.end[mask], day_start + 24) - day_start
+        days.append({
+            'day': index + 1,
+            'distance': float(miles[index]),
+            'drive_time': float(hours[index, DRIVING]),
+            'total_time': float(hours[index, DRIVING] + hours[index, ON_DUTY]),
+            'segments': [
+                (float(start), float(end), int(status))
+                for start, end, status in zip(starts, ends, timeline.status[mask])
+            ],
+        })
+    return days
+
+
+def summary(timeline):
+    on_duty = timeline.status >= DRIVING
+    duration = timeline.end - timeline.start
+    active = np.flatnonzero(timeline.status != OFF_DUTY)
+    return {
+        'driving_hours': float(duration[timeline.status == DRIVING].sum()),
+        'on_duty_hours': float(duration[on_duty].sum()),
+        'elapsed_hours': float(timeline.end[active[-1]] - timeline.start[active[0]]) if len(active) else 0.0,
+        'breaks': timeline.breaks,
+        'resets': timeline.resets,
+        'cycle_restarts': timeline.restarts,
+    }
+
+
+def cycle_hours_available(cycle_used):
+    """Hours left in the 70-hr/8-day cycle; accepts scalars or arrays for batch what-ifs."""
+    return np.maximum(CYCLE_LIMIT - np.asarray(cycle_used, dtype=np.float64), 0)
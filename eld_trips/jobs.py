@@ -0,0 +1,94 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .hos import day_totals
+from .models import RenderJob
+from .rendering import render_trip_logs
+
+logger = logging.getLogger(__name__)
+
+# Jobs pre-render a trip's artifacts and record progress; the rendering itself runs in the render pool
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'RENDER_JOB_WORKERS', 2),
+                    thread_name_prefix='render-job',
+                )
+    return _executor
+
+
+def submit_render_job(trip, timeline, eld_format='png'):
+    days = len(day_totals(timeline)[0])
+    job = RenderJob.objects.create(
+        trip=trip,
+        total_artifacts=days * 2,  # one PDF and one ELD log per day
+        artifacts={'daily_logs': [], 'eld_logs': []},
+    )
+    get_executor().submit(run_render_job, job.pk, timeline, eld_format)
+    return job
+
+
+def run_render_job(job_id, timeline, eld_format='png'):
+    # Runs on the job executor, where nobody reads the future: every failure is recorded on the job
+    try:
+        job = RenderJob.objects.get(pk=job_id)
+        job.status = 'running'
+        job.save(update_fields=['status', 'updated_at'])
+
+        def on_artifact(kind, log):
+            job.artifacts[kind].append(log)
+            job.completed_artifacts += 1
+            job.save(update_fields=['artifacts', 'completed_artifacts', 'updated_at'])
+
+        render_trip_logs(job.trip_id, timeline, on_artifact=on_artifact, eld_format=eld_format)
+        job.status = 'done'
+        job.save(update_fields=['status', 'updated_at'])
+    except Exception as e:
+        logger.exception("Render job %s failed", job_id)
+        try:
+            RenderJob.objects.filter(pk=job_id).update(status='failed', error=str(e) or type(e).__name__, updated_at=timezone.now())
+        except Exception:
+            logger.exception("Could not record the failure of render job %s", job_id)
+    finally:
+        connection.close()
+
+
+def fail_if_stale(job):
+    """Mark a pending or running job failed once it has made no progress for ``RENDER_JOB_STALE_AFTER`` seconds.
+
+    Jobs run in the process that accepted them, so a restart leaves its jobs
+    unfinished; they are failed here, when next polled, and can be resubmitted.
+    """
+    stale_after = timedelta(seconds=getattr(settings, 'RENDER_JOB_STALE_AFTER', 600))
+    if job.status in ('pending', 'running') and job.updated_at < timezone.now() - stale_after:
+        job.status = 'failed'
+        job.error = "Render job stopped making progress; the server may have restarted"
+        job.save(update_fields=['status', 'error', 'updated_at'])
+    return job
+
+
+def job_status(job):
+    by_day = lambda log: log['day']
+    return {
+        'id': job.pk,
+        'trip_id': job.trip_id,
+        'status': job.status,
+        'total_artifacts': job.total_artifacts,
+        'completed_artifacts': job.completed_artifacts,
+        'daily_logs': sorted(job.artifacts.get('daily_logs', []), key=by_day),
+        'eld_logs': sorted(job.artifacts.get('eld_logs', []), key=by_day),
+        'error': job.error,
+    }
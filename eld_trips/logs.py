@@ -0,0 +1,91 @@
+import io
+import os
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .artifacts import TRIP_LOGS_DIR, artifact_key, artifact_path, evict, record_write, write_atomic
+from .charts import get_eld_renderer, render_eld_svg
+from .hos import STATUS_NAMES, log_days
+from .logsheet import render_log_sheet, render_log_sheets
+
+
+def public_log(plan, **urls):
+    # The per-day fields returned by the API; segments stay server side
+    log = {key: value for key, value in plan.items() if key != 'segments'}
+    log.update(urls)
+    return log
+
+
+def render_daily_log_day(artifact_id, plan):
+    day = plan['day']
+
+    buffer = io.BytesIO()
+    render_log_sheet(buffer, day, plan['distance'], plan['segments'])
+    path = artifact_path('daily_logs', artifact_id, day)
+    write_atomic(path, buffer.getvalue())
+    return path
+
+
+def _trip_log_pdf(timeline):
+    buffer = io.BytesIO()
+    pages = ((plan['day'], plan['distance'], plan['segments']) for plan in log_days(timeline))
+    render_log_sheets(buffer, pages)
+    return buffer.getbuffer()
+
+
+def trip_log_path(timeline):
+    """Where ``?persist=1`` keeps a trip's whole-trip PDF; ``evict`` prunes it with the other artifacts."""
+    return os.path.join(settings.MEDIA_ROOT, TRIP_LOGS_DIR, f'trip_log_{artifact_key(timeline)}.pdf')
+
+
+def _persist(path, data):
+    write_atomic(path, data)
+    record_write(path)
+    evict()
+
+
+async def stream_trip_log_pdf(timeline, persist=False, chunk_size=64 * 1024):
+    """Yield one multi-page log PDF for the whole trip, in chunks.
+
+    The document is built in memory, off the event loop; with ``persist`` it is
+    written whole to ``trip_log_path`` before the first chunk is sent, so a client
+    that goes away mid-download never leaves a truncated file. An async generator,
+    so ASGI servers stream it instead of buffering the whole response.
+    """
+    data = await sync_to_async(_trip_log_pdf, thread_sensitive=False)(timeline)
+    if persist:
+        await sync_to_async(_persist, thread_sensitive=False)(trip_log_path(timeline), bytes(data))
+    for start in range(0, len(data), chunk_size):
+        yield bytes(data[start:start + chunk_size])
+
+
+def render_eld_log_day(artifact_id, plan):
+    day = plan['day']
+
+    # Step chart points: each segment's start, plus the end of the last one
+    segments = plan['segments']
+    times = [start for start, _, _ in segments] + [segments[-1][1]]
+    statuses = [STATUS_NAMES[status] for _, _, status in segments] + [STATUS_NAMES[segments[-1][2]]]
+
+    png = get_eld_renderer().render(day, times, statuses)
+    path = artifact_path('eld_logs', artifact_id, day)
+    write_atomic(path, png)
+    return path
+
+
+def inline_eld_log_day(plan, eld_format):
+    """An ELD log day as an SVG string (``svg``) or ``[start, end, status]`` segments (``json``); nothing is written to disk."""
+    if eld_format == 'svg':
+        return public_log(plan, svg=render_eld_svg(plan['day'], plan['segments']))
+    return public_log(plan, segments=[[round(start, 3), round(end, 3), status] for start, end, status in plan['segments']])
+
+
+def generate_daily_log(artifact_id, timeline):
+    """Render every day's log PDF in this process; returns the file paths in day order."""
+    return [render_daily_log_day(artifact_id, plan) for plan in log_days(timeline)]
+
+
+def generate_eld_log(artifact_id, timeline):
+    """Render every day's ELD PNG in this process; returns the file paths in day order."""
+    return [render_eld_log_day(artifact_id, plan) for plan in log_days(timeline)]
@@ -0,0 +1,294 @@
+import threading
+import zlib
+
+from reportlab.graphics.shapes import Drawing, Line, String
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.pdfbase.pdfdoc import PDFArray, PDFDictionary, PDFFormXObject, PDFName, PDFStream, pdfdocEnc
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+PAGE_WIDTH, PAGE_HEIGHT = letter
+MARGIN = 0.25*inch
+FRAME_PADDING = 6  # SimpleDocTemplate's default frame padding
+GRID_WIDTH = 7.5*inch
+GRID_HEIGHT = 2*inch
+FORM_NAME = 'DailyLogSheet'
+
+# Duty segments are (start hour, end hour, status) using the codes in eld_trips.hos:
+# 0=Off Duty, 1=Sleeper, 2=Driving, 3=On Duty. This sample day is used by benchmarks.
+SAMPLE_DUTY_SEGMENTS = [(0, 8, 0), (8, 10, 2), (10, 18, 3), (18, 24, 0)]
+
+
+def _styles():
+    styles = getSampleStyleSheet()
+    normal = styles['Normal']
+    normal.fontSize = 7  # Slightly larger for readability, matching typical log sheets
+    return normal
+
+
+def _header_date(day):
+    return f"March {16 + day}, 2025"
+
+
+def _remarks(day):
+    return f"Trip from Chicago to Madison, Day {day}"
+
+
+def duty_lines(segments):
+    # One horizontal line per segment, joined by a vertical line at each change of status
+    previous_y = None
+    for start, end, status_idx in segments:
+        x1 = start * 4 * (GRID_WIDTH / 96)  # hours -> 15-min increments -> points
+        x2 = end * 4 * (GRID_WIDTH / 96)
+        y = (3 - status_idx) * (GRID_HEIGHT / 4) + (GRID_HEIGHT / 8)
+        if previous_y is not None and previous_y != y:
+            yield x1, previous_y, x1, y
+        yield x1, y, x2, y
+        previous_y = y
+
+
+def build_log_sheet_story(day, daily_distance, duty_segments=(), static_only=False):
+    """Platypus flowables for one log sheet.
+
+    With ``static_only`` the per-day fields and the duty polyline are left out, which
+    is what LogSheetTemplate bakes into its form.
+    """
+    normal = _styles()
+    elements = []
+    distance = "" if static_only else f"{daily_distance:.1f}"
+
+    # Header
+    header_data = [
+        ["Driver's Daily Log", "", "", "", "", "Original: File at home terminal", "", "Duplicate: Driver retains in his/her possession for 8 days"],
+        ["From:", "Chicago, IL", "To:", "Madison, WI", "Date:", "" if static_only else _header_date(day), "Year:", "2025"],
+    ]
+    header_table = Table(header_data, colWidths=[1.5*inch, 1*inch, 0.5*inch, 1*inch, 0.5*inch, 1.5*inch, 0.5*inch, 1.5*inch])
+    header_table.setStyle(TableStyle([
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ('FONTSIZE', (0, 0), (-1, -1), 7),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('SPAN', (0, 0), (4, 0)),  # Span "Driver's Daily Log" across first row
+    ]))
+    elements.append(header_table)
+    elements.append(Spacer(1, 0.1*inch))
+
+    # Top Section
+    top_data = [
+        ["Total Miles Driving Today", distance, "", "Total Mileage Today", distance],
+        ["Truck/Tractor & Trailer Numbers", "TRK-123 / TRL-456", "", "License Plate(s)", "IL-7890"],
+        ["Name of Carrier", "ABC Trucking Co.", "", "Home Terminal Address", "123 Main St, Chicago, IL"],
+    ]
+    top_table = Table(top_data, colWidths=[1.5*inch, 1.5*inch, 0.5*inch, 1.5*inch, 2*inch])
+    top_table.setStyle(TableStyle([
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ('FONTSIZE', (0, 0), (-1, -1), 7),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ]))
+    elements.append(top_table)
+    elements.append(Spacer(1, 0.1*inch))
+
+    # Duty Status Grid
+    drawing = Drawing(GRID_WIDTH, GRID_HEIGHT)  # Wider and taller for exact 24-hour grid
+
+    # Horizontal lines (4 duty statuses + top/bottom)
+    for i in range(5):
+        y = i * (GRID_HEIGHT / 4)
+        drawing.add(Line(0, y, GRID_WIDTH, y, strokeColor=colors.black, strokeWidth=0.5))
+
+    # Vertical lines (24 hours with 15-minute increments = 96 segments)
+    for i in range(97):  # 96 segments + end line
+        x = i * (GRID_WIDTH / 96)
+        drawing.add(Line(x, 0, x, GRID_HEIGHT, strokeColor=colors.black, strokeWidth=0.25 if i % 4 != 0 else 0.5))
+        if i % 4 == 0:  # Label every hour
+            hour = i // 4
+            drawing.add(String(x - 3, GRID_HEIGHT + 5, str(hour), fontSize=6))
+
+    # "Mid" labels
+    drawing.add(String(-15, GRID_HEIGHT + 5, "Mid", fontSize=6))
+    drawing.add(String(GRID_WIDTH - 15, GRID_HEIGHT + 5, "Mid", fontSize=6))
+
+    # Duty status labels
+    statuses = ["1. Off Duty", "2. Sleeper", "3. Driving", "4. On Duty"]
+    for i, status in enumerate(statuses):
+        y = (3.5 - i) * (GRID_HEIGHT / 4) + 5  # Adjusted for vertical centering
+        drawing.add(String(-50, y, status, fontSize=7))
+
+    if not static_only:
+        for x1, y1, x2, y2 in duty_lines(duty_segments):
+            drawing.add(Line(x1, y1, x2, y2, strokeColor=colors.blue, strokeWidth=1))
+
+    elements.append(drawing)
+    elements.append(Spacer(1, 0.1*inch))
+
+    # Remarks and Shipping Documents
+    elements.append(Paragraph("Remarks:", normal))
+    if static_only:
+        elements.append(Spacer(1, normal.leading))
+    else:
+        elements.append(Paragraph(_remarks(day), normal))
+    elements.append(Spacer(1, 0.05*inch))
+    elements.append(Paragraph("Shipping Documents:", normal))
+    elements.append(Paragraph("Attached", normal))
+    elements.append(Spacer(1, 0.1*inch))
+
+    # End of Day Summary Table
+    summary_data = [
+        ["end of", "Drivers", "A", "B", "C", "D", "", "60 Hr", "7", "A", "B", "C", "D", "", "if you took"],
+        ["day", "Initials", "", "", "", "", "", "Day", "Day", "", "", "", "", "", "consecutive"],
+        ["On", "On", "Total", "Total", "Total", "Total", "", "Driven", "Total", "Total", "Total", "Total", "", "hours off"],
+        ["Duty", "Duty", "Duty", "Sleeper", "Driving", "On", "", "8", "hours", "Duty", "Sleeper", "Driving", "On", "", "duty in"],
+        ["1 & 4", "& 5", "7", "7", "7", "7", "", "hrs", "on", "1 & 4", "7", "7", "7", "", "the last"],
+        ["to", "to", "hrs", "hrs", "hrs", "hrs", "", "", "duty", "to", "hrs", "hrs", "hrs", "", "8 days"],
+        ["3 & 6", "8", "incl.", "incl.", "incl.", "incl.", "", "", "last", "3 & 6", "incl.", "incl.", "incl.", "", "& 8"],
+        ["", "", "", "", "", "", "", "", "8 days", "", "", "", "", "", ""],
+    ]
+    summary_table = Table(summary_data, colWidths=[0.5*inch]*14 + [1*inch])
+    summary_table.setStyle(TableStyle([
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ('FONTSIZE', (0, 0), (-1, -1), 6),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ]))
+    elements.append(summary_table)
+    elements.append(Spacer(1, 0.1*inch))
+
+    # Footer Instructions
+    footer_text = (
+        "Enter name of place reported and where released from work and when and where each change of "
+        "duty status occurred. If off duty at home terminal, use time standard from work and when."
+    )
+    elements.append(Paragraph(footer_text, normal))
+
+    return elements
+
+
+def render_log_sheet_platypus(output, day, daily_distance, duty_segments):
+    # Original path: lay out and draw the whole sheet from scratch
+    doc = SimpleDocTemplate(output, pagesize=letter, leftMargin=MARGIN, rightMargin=MARGIN, topMargin=MARGIN, bottomMargin=MARGIN)
+    doc.build(build_log_sheet_story(day, daily_distance, duty_segments))
+
+
+class LogSheetTemplate:
+    """The static log sheet, laid out and drawn once per process.
+
+    The static page is captured as a compressed PDF content stream and installed
+    into each document as a form XObject; pages then reference the form and draw
+    only the date, mileage, remarks and duty polyline on top.
+    """
+
+    def __init__(self):
+        self.normal = _styles()
+        story = build_log_sheet_story(0, 0, static_only=True)
+        header_table, top_table, drawing = story[0], story[2], story[4]
+        remarks_slot = story[7]
+
+        canvas = Canvas(None, pagesize=letter)
+        self.font = canvas._doc.getInternalFontName('Helvetica')
+        canvas.beginForm(FORM_NAME)
+        origins = self._draw_frame(canvas, story)
+        # The form's content stream, compressed once and embedded as-is in every document
+        self._stream = zlib.compress(pdfdocEnc('\n'.join([canvas._preamble] + canvas._code)))
+        canvas.endForm()
+
+        # Where the per-day fields go: (font size, x, y) for each, in page coordinates
+        self.date_slot = self._cell_slot(header_table, origins[header_table], 1, 5)
+        self.distance_slots = [
+            self._cell_slot(top_table, origins[top_table], 0, 1),
+            self._cell_slot(top_table, origins[top_table], 0, 4),
+        ]
+        x, top = origins[remarks_slot]
+        self.remarks_slot = (self.normal.fontSize, x, top - self.normal.fontSize)  # Paragraph's first baseline
+        self.grid_origin = origins[drawing]
+
+    def _draw_frame(self, canvas, story):
+        # Same placement rules as SimpleDocTemplate's single frame; returns each
+        # flowable's origin (bottom left; top left for Spacers)
+        frame_x = MARGIN + FRAME_PADDING
+        frame_width = PAGE_WIDTH - 2*MARGIN - 2*FRAME_PADDING
+        y = PAGE_HEIGHT - MARGIN - FRAME_PADDING
+        origins = {}
+        for i, flowable in enumerate(story):
+            if i:
+                y -= flowable.getSpaceBefore()
+            width, height = flowable.wrap(frame_width, y)
+            if isinstance(flowable, Spacer):
+                origins[flowable] = (frame_x, y)
+                y -= height
+                continue
+            x = frame_x
+            h_align = getattr(flowable, 'hAlign', 'LEFT')
+            if h_align == 'CENTER':
+                x += (frame_width - width) / 2
+            elif h_align == 'RIGHT':
+                x += frame_width - width
+            y -= height
+            flowable.drawOn(canvas, x, y)
+            origins[flowable] = (x, y)
+            y -= flowable.getSpaceAfter()
+        return origins
+
+    @staticmethod
+    def _cell_slot(table, origin, row, col):
+        # Mirrors Table._drawCell for a left-aligned, vertically centred string
+        style = table._cellStyles[row][col]
+        x = origin[0] + table._colpositions[col] + style.leftPadding
+        row_bottom = origin[1] + table._rowpositions[row + 1]
+        row_height = table._rowHeights[row]
+        y = row_bottom + (style.bottomPadding + row_height - style.topPadding + style.leading) / 2.0 - style.fontsize
+        return style.fontsize, x, y
+
+    def install(self, canvas):
+        """Define the static form in ``canvas``'s document; call once per document."""
+        if canvas._doc.getInternalFontName('Helvetica') != self.font:
+            raise ValueError("Log sheet form must be installed before other fonts are registered")
+        form = PDFFormXObject(0, 0, PAGE_WIDTH, PAGE_HEIGHT)
+        # A preset Filter tells ReportLab the content is already encoded
+        form.Contents = PDFStream(PDFDictionary({'Filter': PDFArray([PDFName('FlateDecode')])}), self._stream)
+        canvas._doc.addForm(FORM_NAME, form)
+
+    def draw_page(self, canvas, day, daily_distance, duty_segments):
+        canvas.doForm(FORM_NAME)
+
+        fields = [(self.date_slot, _header_date(day)), (self.remarks_slot, _remarks(day))]
+        fields += [(slot, f"{daily_distance:.1f}") for slot in self.distance_slots]
+        for (font_size, x, y), text in fields:
+            canvas.setFont('Helvetica', font_size)
+            canvas.drawString(x, y, text)
+
+        gx, gy = self.grid_origin
+        canvas.setStrokeColor(colors.blue)
+        canvas.setLineWidth(1)
+        canvas.lines([(gx + x1, gy + y1, gx + x2, gy + y2) for x1, y1, x2, y2 in duty_lines(duty_segments)])
+        canvas.showPage()
+
+
+_template = None
+_template_lock = threading.Lock()
+
+
+def get_log_sheet_template():
+    global _template
+    if _template is None:
+        with _template_lock:
+            if _template is None:
+                _template = LogSheetTemplate()
+    return _template
+
+
+def render_log_sheets(output, pages):
+    """Write one PDF with a page per ``(day, daily_distance, duty_segments)`` in ``pages``."""
+    template = get_log_sheet_template()
+    canvas = Canvas(output, pagesize=letter)
+    template.install(canvas)  # the static form is shared by every page
+    for page in pages:
+        template.draw_page(canvas, *page)
+    canvas.save()
+
+
+def render_log_sheet(output, day, daily_distance, duty_segments):
+    render_log_sheets(output, [(day, daily_distance, duty_segments)])
@@ -0,0 +1,42 @@
+import io
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from eld_trips.logsheet import SAMPLE_DUTY_SEGMENTS, get_log_sheet_template, render_log_sheet, render_log_sheet_platypus
+
+
+class Command(BaseCommand):
+    help = "Compare per-page cost of the platypus log sheet and the precompiled template"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=200)
+
+    def handle(self, *args, **options):
+        pages = options['pages']
+
+        started = time.perf_counter()
+        get_log_sheet_template()
+        self.stdout.write(f"template build (once per process): {(time.perf_counter() - started) * 1000:.2f} ms")
+
+        results = {}
+        for name, render in [('platypus', render_log_sheet_platypus), ('template', render_log_sheet)]:
+            render(io.BytesIO(), 1, 500.0, SAMPLE_DUTY_SEGMENTS)  # warm up imports and font caches
+
+            started = time.perf_counter()
+            for day in range(pages):
+                render(io.BytesIO(), day + 1, 500.0, SAMPLE_DUTY_SEGMENTS)
+            per_page = (time.perf_counter() - started) / pages
+
+            tracemalloc.start()
+            render(io.BytesIO(), 1, 500.0, SAMPLE_DUTY_SEGMENTS)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            results[name] = per_page
+            self.stdout.write(
+                f"{name:>9}: {per_page * 1000:8.2f} ms/page  peak {peak / 1024:8.1f} KiB"
+            )
+
+        self.stdout.write(f"speedup: {results['platypus'] / results['template']:.1f}x")
@@ -0,0 +1,221 @@
+import json
+import os
+import platform
+import resource
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+from django.test.utils import setup_databases, teardown_databases
+
+from eld_trips.geocoding import CachedGeocoder, StubGeocoder, get_geocoder, set_geocoder
+from eld_trips.hos import day_totals, plan_trip
+from eld_trips.logs import generate_daily_log, generate_eld_log
+from eld_trips.planning import calculate_route
+from eld_trips.rendering import get_render_pool
+
+# Lower is better for latencies, higher for throughput
+_COMPARED = {'p50_ms': 1, 'p95_ms': 1, 'p99_ms': 1, 'throughput_per_s': -1}
+
+
+def _latency_stats(seconds, wall):
+    ms = np.asarray(seconds) * 1000
+    return {
+        'count': len(ms),
+        'throughput_per_s': round(len(ms) / wall, 2) if wall else None,
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+def _dir_bytes(root):
+    return sum(os.path.getsize(os.path.join(path, name)) for path, _, names in os.walk(root) for name in names)
+
+
+def _peak_rss():
+    # This process, plus the high-water mark of any live render workers
+    peak = {'main_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024, 'workers_bytes': 0}
+    pool = get_render_pool()
+    for pid in list(getattr(pool, '_processes', None) or {}):
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        peak['workers_bytes'] = max(peak['workers_bytes'], int(line.split()[1]) * 1024)
+        except OSError:
+            pass
+    return peak
+
+
+def _timeline(days):
+    # Shortest single-leg trip whose log spans at least ``days`` days
+    start_hour = getattr(settings, 'HOS_START_HOUR', 6)
+    miles = 50.0
+    while True:
+        timeline = plan_trip([[miles, 1.0]], 0.0, start_hour=start_hour)
+        if len(day_totals(timeline)[0]) >= days:
+            return timeline
+        miles += 50.0
+
+
+def _compare(results, baseline, threshold):
+    regressions = []
+
+    def walk(current, previous, path):
+        for key, value in current.items():
+            if isinstance(value, dict) and isinstance(previous.get(key), dict):
+                walk(value, previous[key], f'{path}.{key}' if path else key)
+            elif key in _COMPARED and isinstance(value, (int, float)) and previous.get(key):
+                change = (value - previous[key]) / previous[key] * _COMPARED[key]
+                if change > threshold:
+                    regressions.append((f'{path}.{key}', previous[key], value, change))
+
+    walk(results['suites'], baseline.get('suites', {}), '')
+    return regressions
+
+
+class Command(BaseCommand):
+    help = "Benchmark routing, log rendering and the trip API, saving the results as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200, help="calculate_route calls")
+        parser.add_argument('--max-days', type=int, default=14, help="longest trip rendered, in log days")
+        parser.add_argument('--render-iterations', type=int, default=3, help="renders per trip length")
+        parser.add_argument('--requests', type=int, default=40, help="trip_api requests, each fetching all of its logs")
+        parser.add_argument('--concurrency', type=int, default=4, help="trip_api clients in parallel")
+        parser.add_argument('--geocode-latency', type=float, default=0.0, help="seconds added to each fake geocode")
+        parser.add_argument('--output', default='bench_trips.json')
+        parser.add_argument('--compare', default=None, help="earlier results to check for regressions")
+        parser.add_argument('--threshold', type=float, default=0.10, help="allowed slowdown before a regression, 0..1")
+
+    def handle(self, *args, **options):
+        previous_geocoder = get_geocoder()
+        results = {
+            'meta': {
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'routing_backend': getattr(settings, 'ROUTING_BACKEND', 'straight_line'),
+                'render_workers': getattr(settings, 'RENDER_MAX_WORKERS', None),
+                'options': {key: options[key] for key in (
+                    'iterations', 'max_days', 'render_iterations', 'requests', 'concurrency', 'geocode_latency',
+                )},
+            },
+            'suites': {},
+        }
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                media_root = os.path.join(tmp, 'media')
+                with override_settings(MEDIA_ROOT=media_root, METRICS_SAMPLE_RATE=0):
+                    results['suites']['calculate_route'] = self.bench_route(options)
+                    for name, generate in [('daily_log', generate_daily_log), ('eld_log', generate_eld_log)]:
+                        results['suites'][name] = self.bench_logs(generate, media_root, options)
+                    results['suites']['trip_api'] = self.bench_api(media_root, os.path.join(tmp, 'bench.sqlite3'), options)
+        finally:
+            set_geocoder(previous_geocoder)
+
+        with open(options['output'], 'w') as f:
+            json.dump(results, f, indent=2)
+        self.stdout.write(f"results written to {options['output']}")
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                regressions = _compare(results, json.load(f), options['threshold'])
+            for metric, before, after, change in regressions:
+                self.stdout.write(f"REGRESSION {metric}: {before} -> {after} ({change:+.0%})")
+            if regressions:
+                raise CommandError(f"{len(regressions)} metric(s) regressed by more than {options['threshold']:.0%}")
+            self.stdout.write(f"no regressions against {options['compare']}")
+
+    def bench_route(self, options):
+        set_geocoder(StubGeocoder(latency=options['geocode_latency']))
+        calculate_route('Chicago, IL', 'Madison, WI', 'Denver, CO')  # warm up
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(options['iterations']):
+            call_started = time.perf_counter()
+            calculate_route('Chicago, IL', 'Madison, WI', 'Denver, CO')
+            latencies.append(time.perf_counter() - call_started)
+        stats = _latency_stats(latencies, time.perf_counter() - started)
+        self.stdout.write(f"calculate_route: {stats['p50_ms']:.2f} ms p50, {stats['throughput_per_s']:.0f}/s")
+        return dict(stats, peak_rss=_peak_rss())
+
+    def bench_logs(self, generate, media_root, options):
+        by_days = {}
+        for days in range(1, options['max_days'] + 1):
+            timeline = _timeline(days)
+            generate(f'bench_{days}', timeline)  # warm up
+            written = _dir_bytes(media_root)
+            latencies = []
+            started = time.perf_counter()
+            for iteration in range(options['render_iterations']):
+                call_started = time.perf_counter()
+                logs = generate(f'bench_{days}_{iteration}', timeline)
+                latencies.append(time.perf_counter() - call_started)
+            stats = _latency_stats(latencies, time.perf_counter() - started)
+            stats['pages'] = len(logs)
+            stats['ms_per_page'] = round(stats['p50_ms'] / len(logs), 3)
+            stats['bytes_written'] = (_dir_bytes(media_root) - written) // options['render_iterations']
+            by_days[str(days)] = stats
+        pages = [stats['ms_per_page'] for stats in by_days.values()]
+        self.stdout.write(f"{generate.__name__}: {np.median(pages):.2f} ms/page over 1-{options['max_days']} days")
+        return {'days': by_days, 'peak_rss': _peak_rss()}
+
+    def bench_api(self, media_root, database, options):
+        set_geocoder(CachedGeocoder(StubGeocoder(latency=options['geocode_latency'])))
+        # A throwaway file database: concurrent writers need SQLite's busy timeout
+        connections['default'].settings_dict.setdefault('TEST', {})['NAME'] = database
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            written = _dir_bytes(media_root)
+
+            def post(index):
+                # Distinct addresses, so every request geocodes; then fetch every log, which renders it
+                data = {
+                    'current_location': f'Bench Start {index}',
+                    'pickup_location': f'Bench Pickup {index}',
+                    'dropoff_location': f'Bench Dropoff {index}',
+                    'cycle_used': index % 40,
+                }
+                client = Client()
+                started = time.perf_counter()
+                response = client.post('/api/trip/', data, content_type='application/json')
+                if response.status_code == 200:
+                    result = response.json()
+                    urls = [log['pdf'] for log in result['daily_logs']] + [log['image'] for log in result['eld_logs']]
+                    for url in urls:
+                        artifact = client.get(url)
+                        if artifact.status_code != 200:
+                            return time.perf_counter() - started, artifact.status_code
+                        b''.join(artifact.streaming_content)
+                return time.perf_counter() - started, response.status_code
+
+            post(-1)  # warm up the render pool
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+                responses = list(executor.map(post, range(options['requests'])))
+            stats = _latency_stats([seconds for seconds, _ in responses], time.perf_counter() - started)
+            statuses = {}
+            for _, status in responses:
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+            stats.update({
+                'concurrency': options['concurrency'],
+                'statuses': statuses,
+                'bytes_written': _dir_bytes(media_root) - written,
+                'peak_rss': _peak_rss(),
+            })
+        finally:
+            teardown_databases(old_config, verbosity=0)
+        self.stdout.write(
+            f"trip_api + logs: {stats['p50_ms']:.1f} ms p50, {stats['p99_ms']:.1f} ms p99, "
+            f"{stats['throughput_per_s']:.1f} req/s at concurrency {options['concurrency']}"
+        )
+        return stats
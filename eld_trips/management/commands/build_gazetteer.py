@@ -0,0 +1,20 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from eld_trips.gazetteer import build_gazetteer
+
+
+class Command(BaseCommand):
+    help = "Build the offline geocoding gazetteer from a CSV of places (name,state,latitude,longitude[,kind,population])"
+
+    def add_arguments(self, parser):
+        parser.add_argument('source')
+        parser.add_argument('--output', default=None, help="SQLite file (default: GAZETTEER_PATH)")
+
+    def handle(self, *args, **options):
+        output = options['output'] or settings.GAZETTEER_PATH
+        started = time.perf_counter()
+        count = build_gazetteer(options['source'], output)
+        self.stdout.write(f"{count} places written to {output} in {time.perf_counter() - started:.1f} s")
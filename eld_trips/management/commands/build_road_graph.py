@@ -0,0 +1,23 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from eld_trips.roadgraph import build_from_osm
+
+
+class Command(BaseCommand):
+    help = "Build the offline road graph from an OSM XML extract (.osm, .osm.bz2 or .osm.gz)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('source')
+        parser.add_argument('--output', default=None, help="Graph directory (default: ROAD_GRAPH_PATH)")
+
+    def handle(self, *args, **options):
+        output = options['output'] or settings.ROAD_GRAPH_PATH
+        started = time.perf_counter()
+        graph = build_from_osm(options['source'], output)
+        self.stdout.write(
+            f"{len(graph)} nodes, {len(graph.indices)} edges written to {output} "
+            f"in {time.perf_counter() - started:.1f} s"
+        )
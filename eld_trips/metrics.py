@@ -0,0 +1,189 @@
+"""Per-request phase timings and process-wide Prometheus metrics.
+
+``TimingMiddleware`` opens a ``RequestMetrics`` for a sampled share of requests
+(``METRICS_SAMPLE_RATE``). Code on the request path reports into it with
+``timed(phase)``, ``record_phase``, ``record_bytes`` and ``record_event``; these
+are no-ops outside a sampled request, except that ``record_event`` always counts
+into the cache counters. Each sampled request ends up in the ``Server-Timing``
+header, one JSON log line and the histograms served at ``/metrics``. Metrics are
+per process.
+"""
+import contextvars
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+logger = logging.getLogger('eld_trips.timing')
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _label_text(names, values):
+    if not names:
+        return ''
+    pairs = ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"')) for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with _registry_lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_label_text(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, buckets, labels=()):
+        self.name, self.help, self.buckets, self.labels = name, help, tuple(buckets), tuple(labels)
+        self._values = {}  # labels -> [per-bucket counts (+Inf last), sum]
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with _registry_lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                labels = _label_text(self.labels + ('le',), key + (bound,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _label_text(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    'trip_http_request_duration_seconds', "Request latency", LATENCY_BUCKETS, ('method', 'route', 'status')
+)
+PHASE_SECONDS = Histogram('trip_phase_duration_seconds', "Time spent in each pipeline phase", LATENCY_BUCKETS, ('phase',))
+ARTIFACT_BYTES = Histogram('trip_artifact_bytes', "Size of rendered log artifacts", BYTES_BUCKETS, ('kind',))
+CACHE_EVENTS = Counter('trip_cache_events_total', "Cache lookups by cache and result", ('cache', 'result'))
+ARTIFACT_EVICTIONS = Counter('trip_artifact_evictions_total', "Log artifacts deleted to keep under ARTIFACT_CACHE_MAX_BYTES")
+ROUTE_FALLBACKS = Counter(
+    'trip_route_fallbacks_total', "Road-graph legs estimated as a straight line instead, by reason", ('reason',),
+)
+
+
+def render_prometheus():
+    with _registry_lock:
+        lines = [line for metric in _registry for line in metric.render()]
+    return '\n'.join(lines) + '\n'
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}  # phase -> [seconds, calls]
+        self.bytes = {}
+        self.events = {}
+        self._lock = threading.Lock()  # geocode lookups report from pool threads
+
+    def add_phase(self, phase, seconds):
+        with self._lock:
+            totals = self.phases.setdefault(phase, [0.0, 0])
+            totals[0] += seconds
+            totals[1] += 1
+
+    def add_bytes(self, kind, size):
+        with self._lock:
+            self.bytes[kind] = self.bytes.get(kind, 0) + size
+
+    def add_event(self, cache, result):
+        with self._lock:
+            key = f'{cache}_{result}'
+            self.events[key] = self.events.get(key, 0) + 1
+
+    def server_timing(self, total):
+        # Phases that run in parallel (geocoding, rendering) report summed time
+        entries = [
+            f'{phase};dur={seconds * 1000:.1f}' + (f';desc="{calls} calls"' if calls > 1 else '')
+            for phase, (seconds, calls) in self.phases.items()
+        ]
+        return ', '.join(entries + [f'total;dur={total * 1000:.1f}'])
+
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+def start_request():
+    return _current.set(RequestMetrics())
+
+
+def finish_request(token, request, response):
+    metrics = _current.get()
+    _current.reset(token)
+    total = time.perf_counter() - metrics.started
+    response['Server-Timing'] = metrics.server_timing(total)
+    logger.info(json.dumps({
+        'event': 'request',
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'duration_ms': round(total * 1000, 2),
+        'phases': {phase: {'ms': round(seconds * 1000, 2), 'calls': calls} for phase, (seconds, calls) in metrics.phases.items()},
+        'bytes': metrics.bytes,
+        'cache': metrics.events,
+    }))
+
+
+def record_phase(phase, seconds):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_phase(phase, seconds)
+        PHASE_SECONDS.observe(seconds, phase=phase)
+
+
+def record_bytes(kind, size):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_bytes(kind, size)
+        ARTIFACT_BYTES.observe(size, kind=kind)
+
+
+def record_event(cache, result):
+    # Hit rates need every lookup, not just the sampled ones
+    CACHE_EVENTS.inc(cache=cache, result=result)
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_event(cache, result)
+
+
+def sampling():
+    return _current.get() is not None
+
+
+@contextmanager
+def timed(phase):
+    if _current.get() is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(phase, time.perf_counter() - started)
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eld_trips', '0003_renderjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='total_distance',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='total_time',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
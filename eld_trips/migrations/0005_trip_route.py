@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eld_trips', '0004_trip_route_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='route',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
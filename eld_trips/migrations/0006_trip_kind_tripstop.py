@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eld_trips', '0005_trip_route'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='kind',
+            field=models.CharField(choices=[('standard', 'Standard'), ('ltl', 'Multi-stop LTL')], default='standard', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='TripStop',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveIntegerField()),
+                ('kind', models.CharField(choices=[('pickup', 'Pickup'), ('dropoff', 'Dropoff')], max_length=10)),
+                ('shipment', models.PositiveIntegerField()),
+                ('address', models.CharField(max_length=200)),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('trip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stops', to='eld_trips.trip')),
+            ],
+            options={
+                'ordering': ['trip', 'sequence'],
+                'constraints': [models.UniqueConstraint(fields=('trip', 'sequence'), name='unique_trip_stop_sequence')],
+            },
+        ),
+    ]
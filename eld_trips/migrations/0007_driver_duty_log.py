@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eld_trips', '0006_trip_kind_tripstop'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Driver',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('log_end', models.DateTimeField(blank=True, null=True)),
+                ('rest_started_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='driver',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trips', to='eld_trips.driver'),
+        ),
+        migrations.CreateModel(
+            name='DutyDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('on_duty_hours', models.FloatField(default=0.0)),
+                ('restart_at', models.DateTimeField(blank=True, null=True)),
+                ('driver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duty_days', to='eld_trips.driver')),
+            ],
+            options={
+                'ordering': ['driver', 'date'],
+                'constraints': [models.UniqueConstraint(fields=('driver', 'date'), name='unique_driver_duty_day')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DutyEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.PositiveSmallIntegerField(choices=[(0, 'Off Duty'), (1, 'Sleeper'), (2, 'Driving'), (3, 'On Duty')])),
+                ('started_at', models.DateTimeField()),
+                ('ended_at', models.DateTimeField()),
+                ('driver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duty_events', to='eld_trips.driver')),
+            ],
+            options={
+                'ordering': ['driver', 'started_at'],
+                'indexes': [models.Index(fields=['driver', 'started_at'], name='duty_event_driver_start')],
+            },
+        ),
+    ]
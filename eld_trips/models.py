@@ -1,11 +1,140 @@
 from django.db import models
 
+
+class Driver(models.Model):
+    name = models.CharField(max_length=200)
+    # Where the duty log currently ends, and the state needed to extend it incrementally
+    log_end = models.DateTimeField(null=True, blank=True)
+    rest_started_at = models.DateTimeField(null=True, blank=True)  # start of the current off-duty run
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+class DutyEvent(models.Model):
+    # A driver's duty-status log; events never cross midnight, so a day's events are one index range
+    STATUS_CHOICES = [
+        (0, 'Off Duty'),
+        (1, 'Sleeper'),
+        (2, 'Driving'),
+        (3, 'On Duty'),
+    ]
+
+    driver = models.ForeignKey(Driver, on_delete=models.CASCADE, related_name='duty_events')
+    status = models.PositiveSmallIntegerField(choices=STATUS_CHOICES)
+    started_at = models.DateTimeField()
+    ended_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['driver', 'started_at']
+        indexes = [
+            models.Index(fields=['driver', 'started_at'], name='duty_event_driver_start'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_status_display()} {self.started_at:%Y-%m-%d %H:%M} - {self.ended_at:%H:%M}"
+
+
+class DutyDay(models.Model):
+    # Per-day totals of a driver's duty events, updated as each event is recorded
+    driver = models.ForeignKey(Driver, on_delete=models.CASCADE, related_name='duty_days')
+    date = models.DateField()
+    on_duty_hours = models.FloatField(default=0.0)  # driving plus on duty not driving
+    restart_at = models.DateTimeField(null=True, blank=True)  # start of a 34+ hr off-duty period begun this day
+
+    class Meta:
+        ordering = ['driver', 'date']
+        constraints = [
+            models.UniqueConstraint(fields=['driver', 'date'], name='unique_driver_duty_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.driver} on {self.date}: {self.on_duty_hours:g} hrs"
+
+
 class Trip(models.Model):
+    KIND_CHOICES = [
+        ('standard', 'Standard'),
+        ('ltl', 'Multi-stop LTL'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default='standard')
+    driver = models.ForeignKey(Driver, on_delete=models.SET_NULL, null=True, blank=True, related_name='trips')
     current_location = models.CharField(max_length=200)
     pickup_location = models.CharField(max_length=200)
     dropoff_location = models.CharField(max_length=200)
     cycle_used = models.FloatField()  # in hours
+    total_distance = models.FloatField(null=True, blank=True)  # in miles, set once routed
+    total_time = models.FloatField(null=True, blank=True)  # in hours, set once routed
+    route = models.JSONField(null=True, blank=True)  # calculate_route output, incl. legs for the HOS timeline
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Trip history pages walk this in reverse, keyed on (created_at, id)
+            models.Index(fields=['created_at', 'id'], name='trip_created_at_id'),
+        ]
+
     def __str__(self):
         return f"Trip from {self.pickup_location} to {self.dropoff_location}"
+
+
+class TripStop(models.Model):
+    # Pickups and dropoffs of a multi-stop trip, in the order they are driven
+    KIND_CHOICES = [
+        ('pickup', 'Pickup'),
+        ('dropoff', 'Dropoff'),
+    ]
+
+    trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name='stops')
+    sequence = models.PositiveIntegerField()
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    shipment = models.PositiveIntegerField()  # pairs a pickup with its dropoff, numbered from 1
+    address = models.CharField(max_length=200)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+
+    class Meta:
+        ordering = ['trip', 'sequence']
+        constraints = [
+            models.UniqueConstraint(fields=['trip', 'sequence'], name='unique_trip_stop_sequence'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.shipment} at {self.address}"
+
+
+class GeocodeCacheEntry(models.Model):
+    # Keyed on the normalized address string, shared by every worker process
+    query = models.CharField(max_length=255, unique=True)
+    found = models.BooleanField(default=True)  # False = negatively cached lookup
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    address = models.TextField(blank=True)
+    expires_at = models.DateTimeField(db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.query
+
+
+class RenderJob(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name='render_jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    total_artifacts = models.PositiveIntegerField(default=0)
+    completed_artifacts = models.PositiveIntegerField(default=0)
+    artifacts = models.JSONField(default=dict)  # {'daily_logs': [...], 'eld_logs': [...]}
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Render job {self.pk} for trip {self.trip_id} ({self.status})"
@@ -0,0 +1,100 @@
+"""Stop ordering for multi-stop trips.
+
+Routes are open paths that start at node 0 (the driver's current location) and
+visit every other node of a precomputed distance matrix once. ``precedence``
+maps a node to the node that has to be visited before it (delivery -> pickup).
+The local search assumes a symmetric matrix.
+"""
+import time
+
+_EPSILON = 1e-9
+
+
+def route_length(matrix, order):
+    return sum(matrix[a][b] for a, b in zip(order, order[1:]))
+
+
+def is_feasible(order, precedence):
+    position = {node: index for index, node in enumerate(order)}
+    return all(position[before] < position[node] for node, before in precedence.items())
+
+
+def nearest_neighbour(matrix, precedence):
+    """Greedy feasible tour: always drive to the closest stop that may be visited next."""
+    order = [0]
+    visited = {0}
+    remaining = set(range(1, len(matrix)))
+    while remaining:
+        here = matrix[order[-1]]
+        node = min(
+            (node for node in remaining if precedence.get(node, 0) in visited),
+            key=lambda node: (here[node], node),
+        )
+        order.append(node)
+        visited.add(node)
+        remaining.remove(node)
+    return order
+
+
+def _two_opt(matrix, order, precedence):
+    # Reversing order[i:j + 1] must not put a delivery ahead of its own pickup
+    n = len(order)
+    for i in range(1, n - 1):
+        a, b = order[i - 1], order[i]
+        segment = {b}
+        for j in range(i + 1, n):
+            c = order[j]
+            if precedence.get(c) in segment:
+                break  # any longer segment also holds both ends of this shipment
+            segment.add(c)
+            delta = matrix[a][c] - matrix[a][b]
+            if j + 1 < n:
+                e = order[j + 1]
+                delta += matrix[b][e] - matrix[c][e]
+            if delta < -_EPSILON:
+                order[i:j + 1] = reversed(order[i:j + 1])
+                return True
+    return False
+
+
+def _or_opt(matrix, order, precedence, max_segment=3):
+    # Move a run of up to ``max_segment`` stops to a cheaper place in the route
+    n = len(order)
+    for length in range(1, max_segment + 1):
+        for i in range(1, n - length + 1):
+            first, last = order[i], order[i + length - 1]
+            prev = order[i - 1]
+            removal = -matrix[prev][first]
+            if i + length < n:
+                nxt = order[i + length]
+                removal += matrix[prev][nxt] - matrix[last][nxt]
+            rest = order[:i] + order[i + length:]
+            for k in range(len(rest)):
+                if k == i - 1:
+                    continue
+                insertion = matrix[rest[k]][first]
+                if k + 1 < len(rest):
+                    insertion += matrix[last][rest[k + 1]] - matrix[rest[k]][rest[k + 1]]
+                if removal + insertion < -_EPSILON:
+                    candidate = rest[:k + 1] + order[i:i + length] + rest[k + 1:]
+                    if is_feasible(candidate, precedence):
+                        order[:] = candidate
+                        return True
+    return False
+
+
+def order_stops(matrix, precedence=None, time_budget=0.5):
+    """Order nodes ``1..n-1`` to minimise total distance from node 0.
+
+    Starts from a nearest-neighbour tour and applies 2-opt and Or-opt moves
+    until none improves the route or ``time_budget`` seconds have passed.
+    """
+    if hasattr(matrix, 'tolist'):
+        matrix = matrix.tolist()  # plain lists index much faster than numpy scalars
+    precedence = precedence or {}
+    deadline = time.monotonic() + time_budget
+    order = nearest_neighbour(matrix, precedence)
+    while time.monotonic() < deadline:
+        if not (_two_opt(matrix, order, precedence) or _or_opt(matrix, order, precedence)):
+            break
+    return order
@@ -0,0 +1,188 @@
+from collections import namedtuple
+from math import ceil
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from .distance import distance_matrix
+from .geocoding import ageocode_many, geocode_many
+from .hos import plan_trip, summary
+from .metrics import timed
+from .models import Trip, TripStop
+from .optimize import order_stops
+from .routing import get_router
+
+
+# A place on the route; ``hours`` on duty there and the instruction for them
+Stop = namedtuple('Stop', ['address', 'label', 'hours', 'action'])
+
+
+def trip_stops(current, pickup, dropoff, stops=()):
+    # Stops in driving order
+    return (
+        [Stop(current, 'current location', 0.0, None), Stop(pickup, 'pickup location', 1.0, "Pick up load")]
+        + [Stop(stop, f'stop {number}', 1.0, f"Stop at {stop}") for number, stop in enumerate(stops, 1)]
+        + [Stop(dropoff, 'dropoff location', 1.0, "Drop off load")]
+    )
+
+
+def calculate_route(current, pickup, dropoff, stops=()):
+    # All lookups run at once; results are checked in driving order
+    route_stops = trip_stops(current, pickup, dropoff, stops)
+    return routes_from_geocodes([route_stops], geocode_many([stop.address for stop in route_stops]))[0]
+
+
+async def acalculate_route(current, pickup, dropoff, stops=()):
+    route_stops = trip_stops(current, pickup, dropoff, stops)
+    futures = await ageocode_many([stop.address for stop in route_stops])
+    # Routing can be CPU-bound (road graph A*), so it runs off the event loop
+    return (await sync_to_async(routes_from_geocodes, thread_sensitive=False)([route_stops], futures))[0]
+
+
+def _geocoded_points(route_stops, futures):
+    try:
+        points = []
+        for stop, future in zip(route_stops, futures):
+            location = future.result()
+            if not location: return None, f"Could not geocode {stop.label}: {stop.address}"
+            points.append([location.latitude, location.longitude])
+        return points, None
+    except Exception as e:
+        return None, f"Geocoding error: {str(e)}"
+
+
+def routes_from_geocodes(routes, futures):
+    """Build routes for several stop lists; ``futures`` follow the flattened stop order.
+
+    Legs for every route that geocoded come from one call to the routing backend.
+    """
+    results, points = [], []
+    position = 0
+    for route_stops in routes:
+        route_points, error = _geocoded_points(route_stops, futures[position:position + len(route_stops)])
+        position += len(route_stops)
+        results.append({'error': error} if error else None)
+        if route_points:
+            points.append(route_points)
+
+    with timed('distance'):
+        legs = iter(get_router().route_many(points))
+    point_lists = iter(points)
+    for i, route_stops in enumerate(routes):
+        if results[i] is None:
+            results[i] = _route(route_stops, next(point_lists), next(legs))
+    return results
+
+
+def shipment_stops(current, shipments):
+    """Stops for an LTL run: the current location, then a pickup and a delivery per shipment.
+
+    Returns the stops and the delivery -> pickup precedence between their indexes.
+    """
+    stops = [Stop(current, 'current location', 0.0, None)]
+    precedence = {}
+    for number, shipment in enumerate(shipments, 1):
+        stops.append(Stop(shipment['pickup'], f'pickup for shipment {number}', 1.0, f"Pick up shipment {number}"))
+        stops.append(Stop(shipment['dropoff'], f'dropoff for shipment {number}', 1.0, f"Drop off shipment {number}"))
+        precedence[len(stops) - 1] = len(stops) - 2
+    return stops, precedence
+
+
+def calculate_multistop_route(current, shipments):
+    """Route an LTL run, ordering its stops to minimise miles with every pickup before its dropoff.
+
+    The result has the usual route keys plus ``stops``, the pickups and
+    dropoffs in driving order.
+    """
+    stops, precedence = shipment_stops(current, shipments)
+    points, error = _geocoded_points(stops, geocode_many([stop.address for stop in stops]))
+    if error:
+        return {'error': error}
+    # Stops are ordered on great-circle miles; only the chosen order is routed
+    with timed('optimize'):
+        order = order_stops(distance_matrix(points), precedence, getattr(settings, 'ROUTE_OPTIMIZE_TIME_BUDGET', 0.5))
+    ordered_points = [points[i] for i in order]
+    with timed('distance'):
+        legs = get_router().route_many([ordered_points])[0]
+    route = _route([stops[i] for i in order], ordered_points, legs)
+    route['stops'] = [
+        {
+            'sequence': sequence,
+            'kind': 'pickup' if index % 2 else 'dropoff',
+            'shipment': (index + 1) // 2,
+            'address': stops[index].address,
+        }
+        for sequence, index in enumerate(order[1:], 1)
+    ]
+    return route
+
+
+def save_multistop_trip(current, cycle_used, route_data, driver=None):
+    # The trip's pickup/dropoff are the first and last stops actually driven to
+    stops = route_data['stops']
+    with transaction.atomic():
+        trip = Trip.objects.create(
+            kind='ltl',
+            driver=driver,
+            current_location=current,
+            pickup_location=stops[0]['address'],
+            dropoff_location=stops[-1]['address'],
+            cycle_used=cycle_used,
+            total_distance=route_data['total_distance'],
+            total_time=route_data['total_time'],
+            route=route_data,
+        )
+        TripStop.objects.bulk_create([
+            TripStop(trip=trip, latitude=latitude, longitude=longitude, **stop)
+            for stop, (latitude, longitude) in zip(stops, route_data['coordinates'][1:])
+        ])
+    return trip
+
+
+def _route(route_stops, coordinates, legs):
+    total_distance = sum(leg.miles for leg in legs)
+    stop_hours = sum(stop.hours for stop in route_stops)
+    driving_time = sum(leg.hours for leg in legs) + stop_hours
+    fuel_stops = max(0, ceil(total_distance / 1000) - 1)
+    total_time = driving_time + (fuel_stops * 0.5)
+
+    instructions = [f"Start at {route_stops[0].address}"]
+    path = [coordinates[0]]
+    for stop, leg in zip(route_stops[1:], legs):
+        instructions.append(f"Drive {leg.miles:.1f} miles to {stop.address} ({leg.hours:.1f} hrs)")
+        instructions.append(f"{stop.action} ({stop.hours:g} hr)")
+        path += leg.path[1:]
+
+    return {
+        'instructions': instructions + ([f"Fuel stop (0.5 hr)"] * fuel_stops),
+        'total_time': total_time,
+        'total_distance': total_distance,
+        'coordinates': coordinates,
+        'path': path,  # road geometry between the stops
+        # (miles, on-duty hrs at the stop, driving hrs) for the HOS timeline
+        'legs': [[leg.miles, stop.hours, leg.hours] for leg, stop in zip(legs, route_stops[1:])]
+    }
+
+
+def trip_timeline(trip):
+    with timed('hos'):
+        return plan_trip(trip.route['legs'], trip.cycle_used, start_hour=getattr(settings, 'HOS_START_HOUR', 6))
+
+
+def trip_result(trip, route_data, timeline):
+    if timeline.restarts:
+        compliance = "Warning: Trip exceeds 70-hr cycle limit"
+    else:
+        compliance = "Trip is within HOS limits"
+    return {
+        'trip_id': trip.id,
+        'cycle_used': trip.cycle_used,
+        'route_instructions': route_data['instructions'],
+        'total_distance': route_data['total_distance'],
+        'total_time': route_data['total_time'],
+        'compliance': compliance,
+        'hos': summary(timeline),
+        'coordinates': route_data['coordinates'],
+        'path': route_data.get('path', route_data['coordinates'])
+    }
@@ -0,0 +1,147 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.conf import settings
+from django.urls import reverse
+
+from .artifacts import artifact_key, artifact_path, cached, evict, record_write
+from .hos import log_days
+from .logs import inline_eld_log_day, public_log, render_daily_log_day, render_eld_log_day
+from .metrics import record_bytes, record_event, record_phase, sampling, timed
+
+RENDERERS = [
+    ('daily_logs', render_daily_log_day, 'pdf'),
+    ('eld_logs', render_eld_log_day, 'image'),
+]
+RENDER_PHASES = {'daily_logs': 'render_pdf', 'eld_logs': 'render_png'}
+ARTIFACT_VIEWS = {'daily_logs': 'trip_daily_log', 'eld_logs': 'trip_eld_log'}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _timed_render(media_root, render, key, plan):
+    # Runs in a pool worker; the parent records the time against its request. MEDIA_ROOT comes
+    # with each task so workers write where the parent looks, even after it overrides the setting
+    settings.MEDIA_ROOT = media_root
+    started = time.perf_counter()
+    path = render(key, plan)
+    return path, time.perf_counter() - started
+
+
+def get_render_pool():
+    # Bounded and shared by every request in this process; spawned so workers never
+    # inherit the parent's DB connections or matplotlib state
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=getattr(settings, 'RENDER_MAX_WORKERS', None) or min(4, os.cpu_count() or 1),
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=django.setup,
+                )
+    return _pool
+
+
+def _record_render(kind, key, day, seconds):
+    size = record_write(artifact_path(kind, key, day))
+    if sampling():
+        record_phase(RENDER_PHASES[kind], seconds)
+        record_bytes(kind, size)
+
+
+def trip_artifact_url(trip_id, kind, day):
+    # Stable per trip and day; the file behind it is rendered on first request
+    return reverse(ARTIFACT_VIEWS[kind], args=[trip_id, day])
+
+
+def _log(trip_id, kind, url_field, plan):
+    return public_log(plan, **{url_field: trip_artifact_url(trip_id, kind, plan['day'])})
+
+
+def trip_logs(trip_id, timeline, eld_format='png'):
+    """Per-day logs linking to artifacts that are rendered when first requested.
+
+    Nothing is rendered here beyond inline ``svg``/``json`` ELD logs. Returns
+    (daily_logs, eld_logs), each in day order.
+    """
+    logs = {'daily_logs': [], 'eld_logs': []}
+    for plan in log_days(timeline):
+        for kind, _, url_field in RENDERERS:
+            if kind == 'eld_logs' and eld_format != 'png':
+                logs[kind].append(inline_eld_log_day(plan, eld_format))
+            else:
+                logs[kind].append(_log(trip_id, kind, url_field, plan))
+    return logs['daily_logs'], logs['eld_logs']
+
+
+def render_artifact(timeline, kind, day):
+    """Path of one day's artifact, rendered in the pool if it is not on disk yet."""
+    key = artifact_key(timeline)
+    if cached(kind, key, day):
+        record_event('artifact_cache', 'hit')
+    else:
+        record_event('artifact_cache', 'miss')
+        plan = log_days(timeline)[day - 1]
+        render = next(render for name, render, _ in RENDERERS if name == kind)
+        _, seconds = get_render_pool().submit(_timed_render, str(settings.MEDIA_ROOT), render, key, plan).result()
+        _record_render(kind, key, day, seconds)
+        evict()
+    return artifact_path(kind, key, day)
+
+
+def _submit_renders(trip_id, timeline, ready, eld_format):
+    # Hand cached and inline artifacts to ``ready`` and submit the rest; returns {future: (kind, url_field, plan)}
+    key = artifact_key(timeline)
+    pool = None
+    futures = {}
+    for plan in log_days(timeline):
+        day = plan['day']
+        for kind, render, url_field in RENDERERS:
+            if kind == 'eld_logs' and eld_format != 'png':
+                with timed(f'render_{eld_format}'):
+                    ready(kind, inline_eld_log_day(plan, eld_format))
+            elif cached(kind, key, day):
+                record_event('artifact_cache', 'hit')
+                ready(kind, _log(trip_id, kind, url_field, plan))
+            else:
+                record_event('artifact_cache', 'miss')
+                pool = pool or get_render_pool()
+                futures[pool.submit(_timed_render, str(settings.MEDIA_ROOT), render, key, plan)] = (kind, url_field, plan)
+    return key, futures
+
+
+def render_trip_logs(trip_id, timeline, on_artifact=None, eld_format='png'):
+    """Render each day's PDF and PNG for a trip's HOS timeline in parallel, ahead of any request for them.
+
+    Returns (daily_logs, eld_logs), each in day order, linking to the same URLs
+    as ``trip_logs``. Artifacts are stored under a hash of the timeline, so a
+    repeat of the same trip reuses the files on disk and renders nothing.
+    ``on_artifact(kind, log)`` is called in this process as each artifact is
+    ready, in completion order. With an ``eld_format`` of ``svg`` or ``json``
+    the ELD logs are built inline instead of rendered to PNG.
+    """
+    logs = {'daily_logs': [], 'eld_logs': []}
+
+    def ready(kind, log):
+        logs[kind].append(log)
+        if on_artifact:
+            on_artifact(kind, log)
+
+    key, futures = _submit_renders(trip_id, timeline, ready, eld_format)
+    for future in as_completed(futures):
+        kind, url_field, plan = futures[future]
+        _, seconds = future.result()
+        _record_render(kind, key, plan['day'], seconds)
+        ready(kind, _log(trip_id, kind, url_field, plan))
+    if futures:
+        evict()
+    for kind_logs in logs.values():
+        kind_logs.sort(key=lambda log: log['day'])
+    return logs['daily_logs'], logs['eld_logs']
+
@@ -0,0 +1,300 @@
+"""Directed road graph in compressed sparse row form, memory-mapped from disk.
+
+A graph directory holds one ``.npy`` file per array plus ``meta.json``:
+
+- ``lat``, ``lon``: node coordinates (float64, degrees)
+- ``indptr``: edges leaving node ``i`` are ``indptr[i]:indptr[i + 1]`` (int64)
+- ``indices``: edge target node (int32)
+- ``miles``, ``hours``: edge length and travel time (float32)
+- ``rindptr``, ``rsources``, ``redges``: the same edges grouped by target node,
+  as source node (int32) and index into the arrays above (int64); graphs saved
+  without them build them in memory on first search
+
+Loading maps the arrays instead of reading them, so start-up is cheap and the
+pages are shared by every worker process on the host.
+"""
+import bz2
+import gzip
+import heapq
+import json
+import math
+import re
+from pathlib import Path
+from xml.etree.ElementTree import iterparse
+
+import numpy as np
+
+from .distance import EARTH_RADIUS_MILES, haversine_matrix, haversine_pairs
+
+ARRAYS = ('lat', 'lon', 'indptr', 'indices', 'miles', 'hours')
+REVERSE_ARRAYS = ('rindptr', 'rsources', 'redges')
+
+# Cell size of the grid index nearest_node searches
+GRID_DEGREES = 0.1
+_GRID_COLUMNS = int(360 / GRID_DEGREES) + 1
+
+# Free-flow truck speeds (mph) for roads without a usable maxspeed tag
+HIGHWAY_SPEEDS = {
+    'motorway': 65, 'motorway_link': 45,
+    'trunk': 55, 'trunk_link': 40,
+    'primary': 50, 'primary_link': 35,
+    'secondary': 45, 'secondary_link': 30,
+    'tertiary': 35, 'tertiary_link': 25,
+    'unclassified': 30, 'residential': 25, 'living_street': 10, 'service': 15,
+}
+
+
+class RoadGraph:
+    def __init__(self, path):
+        self.path = Path(path)
+        for name in ARRAYS:
+            setattr(self, name, np.load(self.path / f'{name}.npy', mmap_mode='r'))
+        meta = json.loads((self.path / 'meta.json').read_text())
+        self.max_speed = meta['max_speed']  # mph; keeps the A* heuristic admissible
+        self._cells = None  # spatial index for nearest_node, built on first use
+        self._reverse = None
+        if all((self.path / f'{name}.npy').exists() for name in REVERSE_ARRAYS):
+            self._reverse = tuple(np.load(self.path / f'{name}.npy', mmap_mode='r') for name in REVERSE_ARRAYS)
+
+    def __len__(self):
+        return len(self.lat)
+
+    @classmethod
+    def save(cls, path, lat, lon, sources, targets, miles, hours):
+        """Write a graph from edge lists; returns the loaded graph."""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        order = np.argsort(sources, kind='stable')
+        indptr = np.zeros(len(lat) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(lat)), out=indptr[1:])
+        arrays = {
+            'lat': np.asarray(lat, dtype=np.float64),
+            'lon': np.asarray(lon, dtype=np.float64),
+            'indptr': indptr,
+            'indices': np.asarray(targets, dtype=np.int32)[order],
+            'miles': np.asarray(miles, dtype=np.float32)[order],
+            'hours': np.asarray(hours, dtype=np.float32)[order],
+        }
+        arrays.update(zip(REVERSE_ARRAYS, _reverse_edges(indptr, arrays['indices'])))
+        for name, array in arrays.items():
+            np.save(path / f'{name}.npy', array)
+        speeds = arrays['miles'] / np.maximum(arrays['hours'], 1e-9)
+        max_speed = float(speeds.max()) if len(speeds) else max(HIGHWAY_SPEEDS.values())
+        (path / 'meta.json').write_text(json.dumps({'nodes': len(lat), 'edges': len(order), 'max_speed': max_speed}))
+        return cls(path)
+
+    def _grid(self):
+        # Node ids sorted by grid cell, so the nodes of a row of cells are one contiguous slice
+        if self._cells is None:
+            rows = np.floor((np.asarray(self.lat) + 90) / GRID_DEGREES).astype(np.int64)
+            cols = np.floor((np.asarray(self.lon) + 180) / GRID_DEGREES).astype(np.int64)
+            keys = rows * _GRID_COLUMNS + cols
+            order = np.argsort(keys, kind='stable')
+            self._cells = keys[order], order
+        return self._cells
+
+    def _nodes_in_box(self, south, north, west, east):
+        keys, order = self._grid()
+        col_range = np.floor((np.array([west, east]) + 180) / GRID_DEGREES).astype(np.int64).clip(0, _GRID_COLUMNS - 1)
+        rows = np.arange(math.floor((south + 90) / GRID_DEGREES), math.floor((north + 90) / GRID_DEGREES) + 1)
+        starts = np.searchsorted(keys, rows * _GRID_COLUMNS + col_range[0], side='left')
+        ends = np.searchsorted(keys, rows * _GRID_COLUMNS + col_range[1], side='right')
+        return np.concatenate([order[start:end] for start, end in zip(starts.tolist(), ends.tolist())] or [order[:0]])
+
+    def nearest_node(self, latitude, longitude):
+        """Closest node to a point and its distance in miles."""
+        if not len(self):
+            raise ValueError("The road graph has no nodes")
+        # Widen a box around the point until it holds a node, then search every node as close as that one
+        half = GRID_DEGREES
+        while True:
+            nodes = self._nodes_in_box(latitude - half, latitude + half, longitude - half, longitude + half)
+            if len(nodes) or half >= 360:
+                break
+            half *= 2
+        if not len(nodes):
+            nodes = np.arange(len(self))
+        distances = haversine_matrix([[latitude, longitude]], np.column_stack([self.lat[nodes], self.lon[nodes]]))[0]
+        nearest = float(distances.min())
+
+        # Bounding box of the circle of that radius: exact on a sphere unless it reaches a pole
+        radius = nearest / EARTH_RADIUS_MILES
+        lat_span = math.degrees(radius)
+        if abs(latitude) + lat_span < 90 and math.sin(radius) < math.cos(math.radians(latitude)):
+            lon_span = math.degrees(math.asin(math.sin(radius) / math.cos(math.radians(latitude))))
+            nodes = self._nodes_in_box(latitude - lat_span, latitude + lat_span, longitude - lon_span, longitude + lon_span)
+        else:
+            nodes = np.arange(len(self))
+        distances = haversine_matrix([[latitude, longitude]], np.column_stack([self.lat[nodes], self.lon[nodes]]))[0]
+        best = int(distances.argmin())
+        return int(nodes[best]), float(distances[best])
+
+    def shortest_path(self, source, target, max_expansions=None):
+        """Fastest path by bidirectional A*; returns ``(miles, hours, nodes)``.
+
+        None when the target is unreachable, or not reached within
+        ``max_expansions`` settled nodes (both directions together).
+        """
+        if source == target:
+            return 0.0, 0.0, [source]
+        # Plain ndarray views of the maps: slicing a np.memmap costs several times more per node
+        lat, lon = np.asarray(self.lat), np.asarray(self.lon)
+        indptr, indices, edge_hours = np.asarray(self.indptr), np.asarray(self.indices), np.asarray(self.hours)
+        if self._reverse is None:
+            self._reverse = _reverse_edges(indptr, indices)
+        rindptr, rsources, redges = (np.asarray(array) for array in self._reverse)
+
+        # Average of the forward and backward straight-line estimates at the fastest
+        # edge speed: consistent for both searches, so each settles a node at most once.
+        # Scalar haversine, computed as nodes are reached: numpy costs more per call than it saves
+        target_lat, target_lon, source_lat, source_lon = map(math.radians, (
+            lat[target], lon[target], lat[source], lon[source]))
+        cos_target, cos_source = math.cos(target_lat), math.cos(source_lat)
+        scale = EARTH_RADIUS_MILES / self.max_speed  # 2R / speed, halved for the average
+        potentials = {}
+
+        def potential(node):
+            value = potentials.get(node)
+            if value is None:
+                node_lat, node_lon = math.radians(lat[node]), math.radians(lon[node])
+                cos_node = math.cos(node_lat)
+                to_target = (math.sin((target_lat - node_lat) / 2) ** 2
+                             + cos_node * cos_target * math.sin((target_lon - node_lon) / 2) ** 2)
+                from_source = (math.sin((node_lat - source_lat) / 2) ** 2
+                               + cos_node * cos_source * math.sin((node_lon - source_lon) / 2) ** 2)
+                value = potentials[node] = scale * (
+                    math.asin(math.sqrt(min(1.0, to_target))) - math.asin(math.sqrt(min(1.0, from_source))))
+            return value
+
+        # Per direction: heap of (cost + potential, node), best cost, node -> (neighbour, edge), settled nodes
+        forward = [(potential(source), source)], {source: 0.0}, {}, set()
+        backward = [(-potential(target), target)], {target: 0.0}, {}, set()
+        best, meeting = math.inf, None
+        expanded = 0
+        while forward[0] and backward[0]:
+            # Stop once no path through an unsettled node can beat the best meeting found
+            if forward[0][0][0] + backward[0][0][0] >= best:
+                break
+            is_forward = len(forward[0]) <= len(backward[0])
+            (heap, costs, links, settled), (_, other_costs, _, _) = (
+                (forward, backward) if is_forward else (backward, forward))
+            _, node = heapq.heappop(heap)
+            if node in settled:
+                continue
+            settled.add(node)
+            expanded += 1
+            if max_expansions is not None and expanded > max_expansions:
+                return None
+            cost = costs[node]
+            if is_forward:
+                start, end = indptr[node:node + 2].tolist()
+                neighbours, edges, sign = indices[start:end].tolist(), range(start, end), 1
+                hours_list = edge_hours[start:end].tolist()
+            else:
+                start, end = rindptr[node:node + 2].tolist()
+                neighbours, edges, sign = rsources[start:end].tolist(), redges[start:end], -1
+                hours_list = edge_hours[edges].tolist()
+                edges = edges.tolist()
+            for neighbour, edge, hours in zip(neighbours, edges, hours_list):
+                new_cost = cost + hours
+                if new_cost < costs.get(neighbour, math.inf):
+                    costs[neighbour] = new_cost
+                    links[neighbour] = node, edge
+                    heapq.heappush(heap, (new_cost + sign * potential(neighbour), neighbour))
+                    through = new_cost + other_costs.get(neighbour, math.inf)
+                    if through < best:
+                        best, meeting = through, neighbour
+        if meeting is None:
+            return None
+
+        # Walk back from the meeting node to the source, then on to the target
+        nodes, edges = [meeting], []
+        for links in (forward[2], backward[2]):
+            nodes.reverse()
+            node = meeting
+            while node in links:
+                node, edge = links[node]
+                nodes.append(node)
+                edges.append(edge)
+        return float(self.miles[edges].sum()), best, nodes
+
+    def coordinates(self, nodes):
+        return np.column_stack([self.lat[nodes], self.lon[nodes]]).tolist()
+
+
+def _reverse_edges(indptr, indices):
+    # Edges grouped by target: (rindptr, rsources, redges)
+    sources = np.repeat(np.arange(len(indptr) - 1, dtype=np.int32), np.diff(indptr))
+    order = np.argsort(indices, kind='stable')
+    rindptr = np.zeros(len(indptr), dtype=np.int64)
+    np.cumsum(np.bincount(indices, minlength=len(indptr) - 1), out=rindptr[1:])
+    return rindptr, sources[order], order.astype(np.int64)
+
+
+def _open(path):
+    path = str(path)
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rb')
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def _speed(tags):
+    match = re.match(r'\s*(\d+(?:\.\d+)?)\s*(mph)?', tags.get('maxspeed', ''))
+    if match:
+        speed = float(match.group(1))
+        return speed if match.group(2) else speed * 0.621371  # km/h unless tagged mph
+    return HIGHWAY_SPEEDS[tags['highway']]
+
+
+def build_from_osm(source, path):
+    """Build a graph from an OSM XML extract (.osm, optionally .bz2/.gz) of drivable roads."""
+    coordinates = {}
+    ways = []
+    with _open(source) as f:
+        refs, tags = [], {}
+        for _, element in iterparse(f, events=('end',)):
+            if element.tag == 'node':
+                coordinates[int(element.get('id'))] = (float(element.get('lat')), float(element.get('lon')))
+            elif element.tag == 'nd':
+                refs.append(int(element.get('ref')))
+            elif element.tag == 'tag':
+                tags[element.get('k')] = element.get('v')
+            elif element.tag == 'way':
+                if tags.get('highway') in HIGHWAY_SPEEDS and tags.get('access') not in ('no', 'private'):
+                    oneway = tags.get('oneway', 'no')
+                    if oneway == '-1':
+                        refs.reverse()
+                    one_direction = oneway in ('yes', 'true', '1', '-1') or tags.get('junction') == 'roundabout'
+                    ways.append((refs, _speed(tags), one_direction))
+            if element.tag in ('node', 'way', 'relation'):
+                # Tags of nodes (gates, signals) and relations belong to them, not the next way
+                refs, tags = [], {}
+                element.clear()
+
+    # Keep only nodes on roads, renumbered densely
+    node_ids = {}
+    sources, targets, speeds = [], [], []
+    for refs, speed, one_direction in ways:
+        refs = [ref for ref in refs if ref in coordinates]
+        for a, b in zip(refs, refs[1:]):
+            a = node_ids.setdefault(a, len(node_ids))
+            b = node_ids.setdefault(b, len(node_ids))
+            sources.append(a)
+            targets.append(b)
+            speeds.append(speed)
+            if not one_direction:
+                sources.append(b)
+                targets.append(a)
+                speeds.append(speed)
+
+    points = np.empty((len(node_ids), 2))
+    for osm_id, node in node_ids.items():
+        points[node] = coordinates[osm_id]
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    miles = haversine_pairs(points[sources], points[targets]) if len(sources) else np.empty(0)
+    hours = miles / np.asarray(speeds, dtype=np.float64)
+    return RoadGraph.save(path, points[:, 0], points[:, 1], sources, targets, miles, hours)
+
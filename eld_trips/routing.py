@@ -0,0 +1,104 @@
+"""Routing backends: drive miles, hours and a map path for each leg of a route.
+
+``ROUTING_BACKEND = 'straight_line'`` (the default) estimates legs from
+great-circle distance at a flat average speed. ``'road_graph'`` routes over the
+offline graph at ``ROAD_GRAPH_PATH`` (see ``manage.py build_road_graph``) and
+falls back to the straight-line estimate for legs the graph does not cover, or
+that it cannot route within ``ROAD_GRAPH_MAX_EXPANSIONS`` settled nodes.
+"""
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+
+from .distance import route_leg_distances
+from .hos import AVERAGE_SPEED
+from .metrics import ROUTE_FALLBACKS
+from .roadgraph import RoadGraph
+
+Leg = namedtuple('Leg', ['miles', 'hours', 'path'])
+
+
+class StraightLineRouter:
+    def route_many(self, routes):
+        """Legs for several routes (lists of ``[lat, lon]`` points) in one vectorized call."""
+        return [
+            [Leg(miles, miles / AVERAGE_SPEED, [a, b]) for miles, a, b in zip(leg_miles.tolist(), points, points[1:])]
+            for points, leg_miles in zip(routes, route_leg_distances(routes))
+        ]
+
+
+class RoadGraphRouter:
+    def __init__(self, graph, snap_miles=25, max_path_points=500, max_expansions=None, fallback=None):
+        self.graph = graph
+        self.snap_miles = snap_miles  # points further than this from any road use the fallback
+        self.max_expansions = max_expansions  # so do legs whose search settles more nodes than this
+        self.max_path_points = max_path_points
+        self.fallback = fallback or StraightLineRouter()
+
+    def route_many(self, routes):
+        return [self.route(points) for points in routes]
+
+    def route(self, points):
+        snapped = [self.graph.nearest_node(*point) for point in points]
+        straight = self.fallback.route_many([points])[0]
+        legs = []
+        for i, estimate in enumerate(straight):
+            (source, source_gap), (target, target_gap) = snapped[i], snapped[i + 1]
+            if max(source_gap, target_gap) > self.snap_miles:
+                ROUTE_FALLBACKS.inc(reason='off_network')
+                legs.append(estimate)
+                continue
+            found = self.graph.shortest_path(source, target, self.max_expansions)
+            if found is None:
+                # Unreachable, or over max_expansions: nearly always the latter on a real road network
+                ROUTE_FALLBACKS.inc(reason='no_path')
+                legs.append(estimate)
+                continue
+            miles, hours, nodes = found
+            # Off-network approach to and from the snapped nodes, at the average speed
+            gap = source_gap + target_gap
+            legs.append(Leg(
+                miles + gap,
+                hours + gap / AVERAGE_SPEED,
+                [points[i]] + self.graph.coordinates(self._thin(nodes)) + [points[i + 1]],
+            ))
+        return legs
+
+    def _thin(self, nodes):
+        # Keep every n-th node so long legs stay small in the response and Trip.route
+        step = max(1, -(-len(nodes) // self.max_path_points))
+        return nodes[::step] + ([nodes[-1]] if (len(nodes) - 1) % step else [])
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def build_router():
+    backend = getattr(settings, 'ROUTING_BACKEND', 'straight_line')
+    if backend == 'road_graph':
+        return RoadGraphRouter(
+            RoadGraph(settings.ROAD_GRAPH_PATH),
+            snap_miles=getattr(settings, 'ROAD_GRAPH_SNAP_MILES', 25),
+            max_path_points=getattr(settings, 'ROUTE_PATH_MAX_POINTS', 500),
+            max_expansions=getattr(settings, 'ROAD_GRAPH_MAX_EXPANSIONS', 200000),
+        )
+    if backend != 'straight_line':
+        raise ValueError(f"Unknown routing backend: {backend}")
+    return StraightLineRouter()
+
+
+def get_router():
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = build_router()
+    return _router
+
+
+def set_router(router):
+    global _router
+    with _router_lock:
+        _router = router
@@ -1,3 +1,1060 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+from xml.etree import ElementTree
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import FileResponse
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus import SimpleDocTemplate
+
+from . import artifacts
+from .batch import _save_valid
+from .cycle import cycle_hours_used, record_duty
+from .distance import haversine_matrix, haversine_pairs, leg_distances, route_leg_distances
+from .gazetteer import GazetteerGeocoder, build_gazetteer
+from .geocoding import CachedGeocoder, StubGeocoder, ageocode_many, geocode_many, get_geocoder, set_geocoder
+from .hos import DRIVING, OFF_DUTY, ON_DUTY, SLEEPER, day_totals, plan_trip
+from .jobs import run_render_job
+from .metrics import ROUTE_FALLBACKS
+from .logsheet import FORM_NAME, MARGIN, build_log_sheet_story, get_log_sheet_template
+from .models import Driver, DutyEvent, GeocodeCacheEntry, RenderJob, Trip, TripStop
+from .optimize import is_feasible, nearest_neighbour, order_stops, route_length
+from .rendering import render_trip_logs
+from .roadgraph import REVERSE_ARRAYS, RoadGraph, build_from_osm
+from .routing import RoadGraphRouter
+
+
+class GazetteerTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp = tempfile.TemporaryDirectory()
+        source = os.path.join(cls.tmp.name, 'places.csv')
+        with open(source, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['name', 'state', 'latitude', 'longitude', 'kind', 'population'])
+            writer.writerow(['Houston', 'TX', 29.76, -95.37, 'city', 2300000])
+            writer.writerow(['Denver', 'CO', 39.74, -104.99, 'city', 700000])
+            writer.writerow(['10001', 'NY', 40.75, -73.99, 'zip', 0])
+            writer.writerow(['77002', 'TX', 29.75, -95.36, 'zip', 0])
+        path = os.path.join(cls.tmp.name, 'gazetteer.sqlite3')
+        build_gazetteer(source, path)
+        cls.geocoder = GazetteerGeocoder(path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+        super().tearDownClass()
+
+    def test_places(self):
+        self.assertEqual(self.geocoder.geocode('Houston, TX').address, 'Houston, TX')
+        self.assertEqual(self.geocoder.geocode('denver co').address, 'Denver, CO')
+        self.assertEqual(self.geocoder.geocode('Denver, Colorado, USA').address, 'Denver, CO')
+        self.assertEqual(self.geocoder.geocode('Houstn, TX').address, 'Houston, TX')
+
+    def test_trailing_zip(self):
+        self.assertEqual(self.geocoder.geocode('10001').address, '10001, NY')
+        self.assertEqual(self.geocoder.geocode('Houston, TX 77002-1234').address, '77002, TX')
+
+    def test_street_addresses_are_left_to_the_remote_geocoder(self):
+        # A house number is not a ZIP, and a city centroid is not a street address
+        self.assertIsNone(self.geocoder.geocode('10001 Katy Fwy, Houston, TX'))
+        self.assertIsNone(self.geocoder.geocode('10001 Katy Fwy, Houston, TX 77002'))
+        self.assertIsNone(self.geocoder.geocode('Dock 4, Houston, TX'))
+
+
+class DutyCycleTests(TestCase):
+    def setUp(self):
+        self.driver = Driver.objects.create(name="Test Driver")
+        self.start = datetime(2026, 3, 2, 6, tzinfo=dt_timezone.utc)
+
+    def record(self, status, start_hour, end_hour):
+        self.driver = record_duty(
+            self.driver, status, self.start + timedelta(hours=start_hour), self.start + timedelta(hours=end_hour)
+        )
+
+    def used(self, hour):
+        return cycle_hours_used(self.driver, self.start + timedelta(hours=hour))
+
+    def test_rolling_window(self):
+        for day in range(9):
+            self.record(DRIVING, day * 24, day * 24 + 10)  # 10 hrs a day, rest in the gaps
+        self.assertAlmostEqual(self.used(5), 5.0)
+        self.assertAlmostEqual(self.used(8), 8.0)
+        self.assertAlmostEqual(self.used(24 + 10), 20.0)
+        # Day 9 drops day 1 out of the 8-day window
+        self.assertAlmostEqual(self.used(8 * 24 + 10), 80.0)
+
+    def test_events_crossing_midnight_are_split(self):
+        self.record(ON_DUTY, 12, 30)
+        self.assertEqual(DutyEvent.objects.filter(driver=self.driver).count(), 2)
+        self.assertAlmostEqual(self.used(30), 18.0)
+        self.assertAlmostEqual(self.used(20), 8.0)
+
+    def test_restart_in_the_log(self):
+        self.record(DRIVING, 0, 11)
+        self.record(OFF_DUTY, 11, 45)
+        self.record(DRIVING, 45, 50)
+        self.assertAlmostEqual(self.used(40), 11.0)
+        self.assertAlmostEqual(self.used(50), 5.0)
+
+    def test_gap_counts_as_off_duty(self):
+        self.record(DRIVING, 0, 11)
+        self.record(DRIVING, 60, 62)  # 49 hrs with nothing logged
+        self.assertAlmostEqual(self.used(62), 2.0)
+
+    def test_rest_after_the_log_ends(self):
+        for day in range(6):
+            self.record(ON_DUTY, day * 24, day * 24 + 11)
+        self.assertAlmostEqual(self.used(5 * 24 + 11), 66.0)
+        self.assertAlmostEqual(self.used(5 * 24 + 11 + 20), 66.0)
+        # No event recorded since, but 34 hrs off duty have restarted the cycle
+        self.assertAlmostEqual(self.used(5 * 24 + 11 + 72), 0.0)
+
+    def test_events_must_be_in_order(self):
+        self.record(DRIVING, 10, 12)
+        with self.assertRaises(ValueError):
+            self.record(DRIVING, 11, 13)
+        with self.assertRaises(ValueError):
+            self.record(DRIVING, 14, 14)
+
+
+class TrackingGeocoder(StubGeocoder):
+    """StubGeocoder recording how many lookups run at once; ``delays`` are seconds per query."""
+
+    def __init__(self, delays):
+        super().__init__()
+        self.delays = delays
+        self.running = self.peak = 0
+
+    async def ageocode(self, query, **kwargs):
+        self.calls += 1
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delays.get(query, 0.01))
+            return self._lookup(query)
+        finally:
+            self.running -= 1
+
+
+class TripApiTests(TestCase):
+    trip = {'current_location': 'Chicago, IL', 'pickup_location': 'Madison, WI', 'dropoff_location': 'Denver, CO'}
+
+    def setUp(self):
+        previous = get_geocoder()
+        set_geocoder(StubGeocoder())
+        self.addCleanup(set_geocoder, previous)
+
+    async def test_async_trip_with_driver(self):
+        driver = await Driver.objects.acreate(name="Test Driver")
+        now = timezone.now()
+        await sync_to_async(record_duty)(driver, DRIVING, now - timedelta(hours=10), now - timedelta(hours=4))
+        response = await AsyncClient().post(
+            '/api/trip/async/', dict(self.trip, driver=driver.id), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertAlmostEqual(response.json()['cycle_used'], 6.0)
+        self.assertEqual(await Trip.objects.filter(driver=driver).acount(), 1)
+
+    async def test_async_trip_errors_match_the_sync_endpoint(self):
+        response = await AsyncClient().post('/api/trip/async/', self.trip, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        expected = await sync_to_async(self.client.post)('/api/trip/', self.trip, content_type='application/json')
+        self.assertEqual(response.json(), expected.json())
+
+    def test_cycle_used_is_bounded(self):
+        for cycle_used in (-500, -0.5, 70.5):
+            response = self.client.post('/api/trip/', dict(self.trip, cycle_used=cycle_used), content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('cycle_used', response.json())
+        self.assertFalse(Trip.objects.exists())
+
+    def test_cycle_used_or_driver_is_required(self):
+        response = self.client.post('/api/trip/', self.trip, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cycle_used', response.json())
+
+    async def test_batch_streams_asynchronously(self):
+        rows = [dict(self.trip, cycle_used=10), {'current_location': 'Chicago, IL'}]
+        response = await AsyncClient().post('/api/trip/batch/', rows, content_type='application/json')
+        self.assertTrue(response.is_async)
+        lines = [json.loads(line) async for line in response.streaming_content]
+        self.assertEqual(sorted(line['index'] for line in lines), [0, 1])
+        planned = next(line for line in lines if line['index'] == 0)
+        self.assertEqual(planned['cycle_used'], 10)
+        self.assertTrue(planned['daily_logs'])
+        self.assertIn('errors', next(line for line in lines if line['index'] == 1))
+
+    async def test_batch_row_errors_stay_on_their_rows(self):
+        rows = {'trips': [
+            dict(self.trip, cycle_used=10),
+            'not a trip',
+            dict(self.trip, cycle_used=80),
+            dict(self.trip, cycle_used=10, pickup_location='Unknown Place'),
+        ]}
+        response = await AsyncClient().post('/api/trip/batch/', rows, content_type='application/json')
+        lines = {line['index']: line for line in [json.loads(line) async for line in response.streaming_content]}
+        self.assertEqual(sorted(lines), [0, 1, 2, 3])
+        self.assertIn('route_instructions', lines[0])
+        self.assertIn('current_location', lines[1]['errors'])
+        self.assertEqual(list(lines[2]['errors']), ['cycle_used'])
+        self.assertEqual(lines[3]['error'], "Could not geocode pickup location: Unknown Place")
+        # Trips that failed to route are still saved, without a route
+        self.assertEqual(await Trip.objects.acount(), 2)
+        self.assertIsNone((await Trip.objects.aget(pk=lines[3]['trip_id'])).route)
+
+    def test_batch_saves_valid_rows_in_one_insert(self):
+        rows = [dict(self.trip, cycle_used=hours) for hours in (0, 10, 20)] + [{}]
+        # Savepoint, one INSERT for every valid row, release
+        with self.assertNumQueries(3):
+            trips, errors = _save_valid(rows)
+        self.assertEqual([index for index, _, _, _ in trips], [0, 1, 2])
+        self.assertEqual([error['index'] for error in errors], [3])
+        self.assertEqual(sorted(Trip.objects.values_list('cycle_used', flat=True)), [0, 10, 20])
+
+    def test_batch_rejects_bad_bodies(self):
+        response = self.client.post('/api/trip/batch/', {'trips': 'none'}, content_type='application/json')
+        self.assertEqual(response.json(), {'error': "Expected a list of trips"})
+        with self.settings(TRIP_BATCH_MAX_SIZE=2):
+            response = self.client.post('/api/trip/batch/', [self.trip] * 3, content_type='application/json')
+        self.assertEqual((response.status_code, response.json()), (400, {'error': "Batch exceeds 2 trips"}))
+
+    @override_settings(TRIP_BATCH_CONCURRENCY=2)
+    async def test_batch_bounds_lookups_and_sends_each_trip_once_routed(self):
+        geocoder = TrackingGeocoder({'Slow City, TX': 1})
+        set_geocoder(geocoder)
+        rows = [dict(self.trip, cycle_used=10, dropoff_location=city)
+                for city in ('Slow City, TX', 'Omaha, NE', 'Tulsa, OK', 'Boise, ID')]
+        response = await AsyncClient().post('/api/trip/batch/', rows, content_type='application/json')
+        lines = [json.loads(line) async for line in response.streaming_content]
+        self.assertEqual(geocoder.peak, 2)
+        self.assertEqual(geocoder.calls, 6)  # Chicago and Madison looked up once for all four trips
+        # The trip waiting on the slow lookup does not hold back the others
+        self.assertEqual(lines[-1]['index'], 0)
+        self.assertEqual(sorted(line['index'] for line in lines), [0, 1, 2, 3])
+        for line in lines:
+            trip = await Trip.objects.aget(pk=line['trip_id'])
+            self.assertAlmostEqual(trip.total_distance, line['total_distance'])
+
+    async def test_trip_log_pdf_streams_asynchronously(self):
+        client = AsyncClient()
+        response = await client.post('/api/trip/async/', dict(self.trip, cycle_used=10), content_type='application/json')
+        response = await client.get(f"/api/trip/{response.json()['trip_id']}/logs.pdf")
+        self.assertTrue(response.is_async)
+        self.assertTrue(b''.join([chunk async for chunk in response.streaming_content]).startswith(b'%PDF'))
+
+    async def test_persisted_trip_log_pdf_is_served_from_disk(self):
+        client = AsyncClient()
+        response = await client.post('/api/trip/async/', dict(self.trip, cycle_used=10), content_type='application/json')
+        url = f"/api/trip/{response.json()['trip_id']}/logs.pdf"
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+            streamed = await client.get(url + '?persist=1')
+            pdf = b''.join([chunk async for chunk in streamed.streaming_content])
+            self.assertEqual(os.listdir(media_root), ['trip_logs'])
+            served = await client.get(url)
+            self.assertIsInstance(served, FileResponse)
+            self.assertEqual(b''.join(served.streaming_content), pdf)
+
+            # Persisted PDFs count towards the artifact cache and are evicted with it
+            self.assertEqual(await sync_to_async(artifacts.evict)(max_bytes=0), 1)
+            self.assertEqual(os.listdir(os.path.join(media_root, 'trip_logs')), [])
+            streamed = await client.get(url)
+            self.assertTrue(streamed.is_async)
+
+
+class ArtifactEvictionTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings = self.settings(MEDIA_ROOT=tmp.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        artifacts._usage.update(bytes=None, scanned=0.0)
+
+    def write(self, day, age):
+        path = artifacts.artifact_path('daily_logs', 'key', day)
+        artifacts.write_atomic(path, b'x' * 100)
+        os.utime(path, (0, 1000000 - age))
+        return path
+
+    def test_least_recently_used_are_evicted(self):
+        paths = [self.write(day, age) for day, age in ((1, 30), (2, 20), (3, 10))]
+        self.assertEqual(artifacts.evict(max_bytes=250), 1)
+        self.assertEqual([os.path.exists(path) for path in paths], [False, True, True])
+
+        # Under the limit, tracked writes are enough and nothing is scanned
+        with mock.patch.object(artifacts, '_scan', side_effect=AssertionError("scanned")):
+            self.assertEqual(artifacts.evict(max_bytes=250), 0)
+        artifacts.record_write(self.write(4, 0))
+        self.assertEqual(artifacts.evict(max_bytes=250), 1)
+        self.assertFalse(os.path.exists(paths[1]))
+
+
+class RouteLegDistanceTests(SimpleTestCase):
+    routes = [
+        [[41.88, -87.63], [43.07, -89.40], [39.74, -104.99]],
+        [[29.76, -95.37]],
+        [[47.61, -122.33], [45.52, -122.68]],
+        [[33.45, -112.07], [36.17, -115.14], [34.05, -118.24], [37.77, -122.42]],
+    ]
+
+    def test_matches_each_route_on_its_own(self):
+        for method in ('haversine', 'geodesic'):
+            legs = route_leg_distances(self.routes, method)
+            self.assertEqual([len(route_legs) for route_legs in legs], [2, 0, 1, 3])
+            for route, route_legs in zip(self.routes, legs):
+                np.testing.assert_allclose(route_legs, leg_distances(route, method))
+
+    def test_haversine_is_close_to_the_geodesic(self):
+        for haversine, geodesic in zip(route_leg_distances(self.routes), route_leg_distances(self.routes, 'geodesic')):
+            np.testing.assert_allclose(haversine, geodesic, rtol=0.006)
+
+    def test_no_routes(self):
+        self.assertEqual(route_leg_distances([]), [])
+
+
+class RoadGraphTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # A 30 x 30 grid of two-way roads, half of them at 65 mph and half at 25
+        cls.tmp = tempfile.TemporaryDirectory()
+        size = 30
+        rng = random.Random(0)
+        lat = [38 + row * 0.05 + rng.uniform(-0.01, 0.01) for row in range(size) for _ in range(size)]
+        lon = [-100 + col * 0.05 + rng.uniform(-0.01, 0.01) for _ in range(size) for col in range(size)]
+        pairs = [(i, i + 1) for i in range(size * size) if (i + 1) % size] + [(i, i + size) for i in range(size * (size - 1))]
+        sources = [a for a, b in pairs] + [b for a, b in pairs]
+        targets = [b for a, b in pairs] + [a for a, b in pairs]
+        points = [[lat[i], lon[i]] for i in range(size * size)]
+        miles = haversine_pairs([points[i] for i in sources], [points[i] for i in targets])
+        speeds = [65 if (a // size) % 2 else 25 for a, b in pairs] * 2
+        cls.graph = RoadGraph.save(cls.tmp.name, lat, lon, sources, targets, miles, miles / speeds)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+        super().tearDownClass()
+
+    def test_nearest_node_matches_a_full_scan(self):
+        rng = random.Random(1)
+        for _ in range(50):
+            point = [rng.uniform(37.5, 40), rng.uniform(-100.5, -98)]
+            distances = haversine_matrix([point], list(zip(self.graph.lat, self.graph.lon)))[0]
+            node, miles = self.graph.nearest_node(*point)
+            self.assertEqual(node, int(distances.argmin()))
+            self.assertAlmostEqual(miles, float(distances.min()))
+
+    def test_shortest_path(self):
+        miles, hours, nodes = self.graph.shortest_path(0, 899)
+        self.assertEqual((nodes[0], nodes[-1]), (0, 899))
+        # Consecutive nodes are joined by an edge, and the costs add up along them
+        edges = [
+            next(edge for edge in range(self.graph.indptr[a], self.graph.indptr[a + 1]) if self.graph.indices[edge] == b)
+            for a, b in zip(nodes, nodes[1:])
+        ]
+        self.assertAlmostEqual(miles, float(self.graph.miles[edges].sum()), places=3)
+        self.assertAlmostEqual(hours, float(self.graph.hours[edges].sum()), places=3)
+        self.assertEqual(self.graph.shortest_path(5, 5), (0.0, 0.0, [5]))
+
+    def test_capped_search_falls_back_to_a_straight_line(self):
+        self.assertIsNone(self.graph.shortest_path(0, 899, max_expansions=10))
+        start = [float(self.graph.lat[0]), float(self.graph.lon[0])]
+        end = [float(self.graph.lat[899]), float(self.graph.lon[899])]
+        routed = RoadGraphRouter(self.graph).route([start, end])[0]
+        fallbacks = ROUTE_FALLBACKS._values.get(('no_path',), 0)
+        capped = RoadGraphRouter(self.graph, max_expansions=10).route([start, end])[0]
+        self.assertGreater(len(routed.path), 2)
+        self.assertEqual(capped.path, [start, end])
+        self.assertEqual(ROUTE_FALLBACKS._values[('no_path',)], fallbacks + 1)
+
+    def test_graph_saved_without_reverse_edges(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            shutil.copytree(self.tmp.name, tmp, dirs_exist_ok=True)
+            for name in REVERSE_ARRAYS:
+                os.remove(os.path.join(tmp, f'{name}.npy'))
+            graph = RoadGraph(tmp)
+            for source, target in [(0, 899), (899, 0), (31, 868)]:
+                self.assertEqual(graph.shortest_path(source, target), self.graph.shortest_path(source, target))
+
+    def test_osm_node_tags_do_not_leak_into_ways(self):
+        osm = """<?xml version="1.0"?>
+<osm>
+  <node id="1" lat="40.0" lon="-100.0"><tag k="barrier" v="gate"/><tag k="access" v="private"/></node>
+  <node id="2" lat="40.0" lon="-99.9"><tag k="oneway" v="yes"/><tag k="maxspeed" v="5 mph"/></node>
+  <node id="3" lat="40.1" lon="-99.9"/>
+  <way id="10"><nd ref="1"/><nd ref="2"/><tag k="highway" v="primary"/></way>
+  <relation id="20"><tag k="highway" v="motorway"/><tag k="access" v="no"/></relation>
+  <way id="11"><nd ref="2"/><nd ref="3"/><tag k="highway" v="residential"/></way>
+</osm>"""
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, 'extract.osm')
+            with open(source, 'w') as f:
+                f.write(osm)
+            graph = build_from_osm(source, os.path.join(tmp, 'graph'))
+            # Both ways kept, both two-way, each at its highway's speed
+            self.assertEqual((len(graph), len(graph.indices)), (3, 4))
+            speeds = sorted({round(float(miles / hours)) for miles, hours in zip(graph.miles, graph.hours)})
+            self.assertEqual(speeds, [25, 50])
+
+
+class FailingGeocoder:
+    def __init__(self):
+        self.calls = 0
+
+    def geocode(self, query, **kwargs):
+        self.calls += 1
+        raise TimeoutError("backend down")
+
+
+@contextmanager
+def later(seconds):
+    # Both cache layers compare expiry against the clock
+    now, wall = timezone.now(), time.time()
+    with mock.patch('django.utils.timezone.now', return_value=now + timedelta(seconds=seconds)), \
+            mock.patch('eld_trips.geocoding.time.time', return_value=wall + seconds):
+        yield
+
+
+class CachedGeocoderTests(TestCase):
+    def setUp(self):
+        self.backend = StubGeocoder({'Nowhere, ZZ': None})
+        self.geocoder = CachedGeocoder(self.backend, max_size=2, ttl=3600, negative_ttl=60)
+
+    def test_repeat_lookups_are_cached(self):
+        first = self.geocoder.geocode('Chicago, IL')
+        self.assertEqual(self.geocoder.geocode('  chicago ,IL. '), first)
+        self.assertEqual(self.backend.calls, 1)
+        # A new process starts with an empty memory cache and reads the shared DB one
+        self.assertEqual(CachedGeocoder(self.backend).geocode('Chicago, IL'), first)
+        self.assertEqual(self.backend.calls, 1)
+
+    def test_least_recently_used_leave_the_memory_cache(self):
+        for query in ('a city', 'b city', 'a city', 'c city'):
+            self.geocoder.geocode(query)
+        GeocodeCacheEntry.objects.all().delete()
+        self.geocoder.geocode('a city')
+        self.geocoder.geocode('c city')
+        self.assertEqual(self.backend.calls, 3)
+        self.geocoder.geocode('b city')
+        self.assertEqual(self.backend.calls, 4)
+
+    def test_entries_expire(self):
+        self.geocoder.geocode('Chicago, IL')
+        with later(3599):
+            self.geocoder.geocode('Chicago, IL')
+            self.assertEqual(self.backend.calls, 1)
+        with later(3601):
+            self.geocoder.geocode('Chicago, IL')
+            self.assertEqual(self.backend.calls, 2)
+
+    def test_no_match_is_cached_for_the_negative_ttl(self):
+        self.assertIsNone(self.geocoder.geocode('Nowhere, ZZ'))
+        self.assertIsNone(self.geocoder.geocode('Nowhere, ZZ'))
+        self.assertEqual(self.backend.calls, 1)
+        self.assertFalse(GeocodeCacheEntry.objects.get(query='nowhere, zz').found)
+        with later(61):
+            self.assertIsNone(self.geocoder.geocode('Nowhere, ZZ'))
+            self.assertEqual(self.backend.calls, 2)
+
+    def test_errors_are_not_cached(self):
+        backend = FailingGeocoder()
+        geocoder = CachedGeocoder(backend)
+        for _ in range(2):
+            with self.assertRaises(TimeoutError):
+                geocoder.geocode('Chicago, IL')
+        self.assertEqual(backend.calls, 2)
+        self.assertFalse(GeocodeCacheEntry.objects.exists())
+
+
+class BlockingGeocoder(StubGeocoder):
+    """Lookups wait on ``barrier`` (all of them must be in flight together), or forever for ``stuck``."""
+
+    def __init__(self, parties, stuck=()):
+        super().__init__()
+        self.barrier = threading.Barrier(parties, timeout=5)
+        self.stuck = stuck
+        self.release = threading.Event()
+
+    def geocode(self, query, **kwargs):
+        self.calls += 1
+        if query in self.stuck:
+            self.release.wait(5)
+        else:
+            self.barrier.wait()
+        return self._lookup(query)
+
+
+class GeocodeManyTests(SimpleTestCase):
+    def setUp(self):
+        previous = get_geocoder()
+        self.addCleanup(set_geocoder, previous)
+
+    def test_distinct_addresses_are_looked_up_concurrently_once(self):
+        geocoder = BlockingGeocoder(3)
+        set_geocoder(geocoder)
+        queries = ['Chicago, IL', 'Madison, WI', ' chicago ,IL. ', 'Denver, CO', 'Madison, WI']
+        futures = geocode_many(queries, timeout=5)
+        # Three distinct addresses, all waiting on the barrier at once
+        self.assertEqual(geocoder.calls, 3)
+        self.assertIs(futures[0], futures[2])
+        self.assertIs(futures[1], futures[4])
+        expected = StubGeocoder()
+        self.assertEqual(
+            [future.result()[:2] for future in futures], [expected.geocode(query)[:2] for query in queries],
+        )
+
+    def test_lookups_past_the_deadline_time_out(self):
+        geocoder = BlockingGeocoder(1, stuck=('Denver, CO',))
+        self.addCleanup(geocoder.release.set)
+        set_geocoder(geocoder)
+        chicago, denver = geocode_many(['Chicago, IL', 'Denver, CO'], timeout=0.5)
+        self.assertEqual(chicago.result(), StubGeocoder().geocode('Chicago, IL'))
+        with self.assertRaises(TimeoutError):
+            denver.result()
+
+    async def test_async_lookups_past_the_deadline_are_cancelled(self):
+        set_geocoder(TrackingGeocoder({'Denver, CO': 5}))
+        chicago, denver = await ageocode_many(['Chicago, IL', 'Denver, CO'], timeout=0.5)
+        self.assertEqual(chicago.result(), StubGeocoder().geocode('Chicago, IL'))
+        with self.assertRaises(TimeoutError):
+            denver.result()
+
+
+class PlanTripTests(SimpleTestCase):
+    def segments(self, timeline):
+        return list(zip(timeline.start.tolist(), timeline.end.tolist(), timeline.status.tolist(), timeline.miles.tolist()))
+
+    def driving_before(self, timeline, status):
+        # Hours driven before the first segment with ``status``
+        hours = 0.0
+        for start, end, segment_status, _ in self.segments(timeline):
+            if segment_status == status:
+                return hours
+            if segment_status == DRIVING:
+                hours += end - start
+        return hours
+
+    def test_short_trip(self):
+        timeline = plan_trip([[100, 1]], start_hour=6)
+        self.assertEqual(
+            [(start, end, status) for start, end, status, _ in self.segments(timeline)],
+            [(0, 6, OFF_DUTY), (6, 8, DRIVING), (8, 9, ON_DUTY), (9, 24, OFF_DUTY)],
+        )
+        self.assertEqual((timeline.breaks, timeline.resets, timeline.restarts), (0, 0, 0))
+
+    def test_break_after_8_hours_of_driving(self):
+        timeline = plan_trip([[500, 0]])
+        self.assertEqual(timeline.breaks, 1)
+        self.assertAlmostEqual(self.driving_before(timeline, OFF_DUTY), 8)
+        self.assertIn((8, 8.5, OFF_DUTY, 0), self.segments(timeline))
+
+    def test_11_hour_driving_limit(self):
+        timeline = plan_trip([[700, 0]])
+        self.assertEqual(timeline.resets, 1)
+        self.assertAlmostEqual(self.driving_before(timeline, SLEEPER), 11)
+        self.assertIn((11.5, 21.5, SLEEPER, 0), self.segments(timeline))
+
+    def test_14_hour_window(self):
+        # 2 hrs driving and 10 on duty leave 2 hrs of the window for driving
+        timeline = plan_trip([[100, 10], [400, 0]])
+        self.assertEqual(timeline.resets, 1)
+        self.assertAlmostEqual(self.driving_before(timeline, SLEEPER), 4)
+
+    def test_fuel_stop_every_1000_miles(self):
+        timeline = plan_trip([[1200, 0]])
+        miles = 0.0
+        for _, _, status, segment_miles in self.segments(timeline):
+            if status == ON_DUTY:
+                break
+            miles += segment_miles
+        self.assertAlmostEqual(miles, 1000)
+
+    def test_restart_at_the_70_hour_cycle_limit(self):
+        timeline = plan_trip([[200, 0]], cycle_used=69)
+        self.assertEqual(timeline.restarts, 1)
+        self.assertAlmostEqual(self.driving_before(timeline, OFF_DUTY), 1)
+        self.assertIn((1, 35, OFF_DUTY, 0), self.segments(timeline))
+
+    def test_days_add_up(self):
+        timeline = plan_trip([[2500, 1], [900, 1]], cycle_used=30, start_hour=6)
+        hours, miles = day_totals(timeline)
+        self.assertTrue((abs(hours.sum(axis=1) - 24) < 1e-6).all())
+        self.assertAlmostEqual(float(miles.sum()), 3400)
+        driving = [end - start for start, end, status, _ in self.segments(timeline) if status == DRIVING]
+        self.assertLessEqual(max(driving), 8 + 1e-9)
+
+
+class MultiStopTripTests(TestCase):
+    # Everything on one parallel: shipment 2 is on the way, so it is delivered first
+    places = {
+        'Depot': (40, -100),
+        'Far Pickup': (40, -90), 'Far Dropoff': (40, -80),
+        'Near Pickup': (40, -99), 'Near Dropoff': (40, -98),
+    }
+    shipments = [
+        {'pickup': 'Far Pickup', 'dropoff': 'Far Dropoff'},
+        {'pickup': 'Near Pickup', 'dropoff': 'Near Dropoff'},
+    ]
+
+    def setUp(self):
+        previous = get_geocoder()
+        set_geocoder(StubGeocoder(self.places))
+        self.addCleanup(set_geocoder, previous)
+
+    def post(self, **data):
+        return self.client.post('/api/trip/multistop/', dict(
+            {'current_location': 'Depot', 'shipments': self.shipments, 'cycle_used': 10}, **data,
+        ), content_type='application/json')
+
+    def test_stops_are_ordered_and_saved(self):
+        response = self.post()
+        self.assertEqual(response.status_code, 200)
+        order = ['Near Pickup', 'Near Dropoff', 'Far Pickup', 'Far Dropoff']
+        self.assertEqual(response.json()['stops'], [
+            {'sequence': 1, 'kind': 'pickup', 'shipment': 2, 'address': 'Near Pickup'},
+            {'sequence': 2, 'kind': 'dropoff', 'shipment': 2, 'address': 'Near Dropoff'},
+            {'sequence': 3, 'kind': 'pickup', 'shipment': 1, 'address': 'Far Pickup'},
+            {'sequence': 4, 'kind': 'dropoff', 'shipment': 1, 'address': 'Far Dropoff'},
+        ])
+        trip = Trip.objects.get(pk=response.json()['trip_id'])
+        self.assertEqual(
+            (trip.kind, trip.current_location, trip.pickup_location, trip.dropoff_location),
+            ('ltl', 'Depot', 'Near Pickup', 'Far Dropoff'),
+        )
+        self.assertAlmostEqual(trip.total_distance, response.json()['total_distance'])
+        stops = trip.stops.order_by('sequence')
+        self.assertEqual([stop.address for stop in stops], order)
+        self.assertEqual([(stop.latitude, stop.longitude) for stop in stops], [self.places[address] for address in order])
+
+    def test_invalid_shipments(self):
+        for shipments in ([], [{'pickup': 'Far Pickup'}], 'Far Pickup'):
+            response = self.post(shipments=shipments)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('shipments', response.json())
+        with self.settings(TRIP_MAX_STOPS=2):
+            response = self.post()
+        self.assertEqual(response.json()['shipments'], ["At most 1 shipments are allowed."])
+        self.assertFalse(Trip.objects.exists())
+
+    def test_ungeocodable_stop_saves_nothing(self):
+        response = self.post(shipments=self.shipments + [{'pickup': 'Unknown Place', 'dropoff': 'Depot'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': "Could not geocode pickup for shipment 3: Unknown Place"})
+        self.assertFalse(Trip.objects.exists())
+        self.assertFalse(TripStop.objects.exists())
+
+
+class OrderStopsTests(SimpleTestCase):
+    def matrix(self, points):
+        return [[abs(a[0] - b[0]) + abs(a[1] - b[1]) for b in points] for a in points]
+
+    def test_pickup_comes_before_its_delivery(self):
+        matrix = self.matrix([(0, 0), (10, 0), (5, 0)])
+        self.assertEqual(order_stops(matrix), [0, 2, 1])
+        self.assertEqual(order_stops(matrix, {2: 1}), [0, 1, 2])
+
+    def test_random_shipments(self):
+        rng = random.Random(2)
+        for _ in range(20):
+            points = [(rng.uniform(0, 100), rng.uniform(0, 100)) for _ in range(13)]
+            # Node 2k - 1 picks up the shipment that node 2k delivers
+            precedence = {2 * k: 2 * k - 1 for k in range(1, 7)}
+            matrix = self.matrix(points)
+            order = order_stops(matrix, precedence)
+            self.assertEqual(sorted(order), list(range(13)))
+            self.assertEqual(order[0], 0)
+            self.assertTrue(is_feasible(order, precedence))
+            self.assertLessEqual(route_length(matrix, order), route_length(matrix, nearest_neighbour(matrix, precedence)) + 1e-9)
+
+
+class RequestMetricsTests(TestCase):
+    trip = {'current_location': 'Chicago, IL', 'pickup_location': 'Madison, WI', 'dropoff_location': 'Denver, CO', 'cycle_used': 10}
+
+    def setUp(self):
+        previous = get_geocoder()
+        set_geocoder(StubGeocoder())
+        self.addCleanup(set_geocoder, previous)
+
+    def plan(self):
+        response = self.client.post('/api/trip/', self.trip, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_server_timing_breaks_down_the_request(self):
+        timing = self.plan()['Server-Timing']
+        entries = dict(entry.split(';', 1) for entry in timing.split(', '))
+        self.assertEqual(list(entries), ['form', 'geocode', 'distance', 'db', 'hos', 'total'])
+        self.assertIn('desc="3 calls"', entries['geocode'])
+        # Sequential phases fit in the total; lookups run in parallel and report their sum
+        durations = {name: float(re.search(r'dur=([\d.]+)', entry).group(1)) for name, entry in entries.items()}
+        self.assertLessEqual(sum(durations[name] for name in ('form', 'distance', 'db', 'hos')), durations['total'])
+
+    def test_unsampled_requests_are_still_counted(self):
+        def count():
+            body = self.client.get('/metrics').content.decode()
+            match = re.search(
+                r'^trip_http_request_duration_seconds_count\{method="POST",route="api/trip/",status="200"\} (\d+)$',
+                body, re.MULTILINE,
+            )
+            return int(match.group(1)) if match else 0
+
+        before = count()
+        with self.settings(METRICS_SAMPLE_RATE=0):
+            self.assertNotIn('Server-Timing', self.plan())
+        self.assertEqual(count(), before + 1)
+
+    def test_metrics_are_prometheus_text(self):
+        self.plan()
+        response = self.client.get('/metrics')
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        body = response.content.decode()
+        for name, kind in [('trip_http_request_duration_seconds', 'histogram'), ('trip_phase_duration_seconds', 'histogram'),
+                           ('trip_cache_events_total', 'counter')]:
+            self.assertIn(f'# TYPE {name} {kind}\n', body)
+        # Buckets are cumulative and end at the count
+        buckets = [int(value) for value in re.findall(r'^trip_phase_duration_seconds_bucket\{phase="hos",le="[^"]+"\} (\d+)$', body, re.MULTILINE)]
+        self.assertEqual(buckets, sorted(buckets))
+        count = re.search(r'^trip_phase_duration_seconds_count\{phase="hos"\} (\d+)$', body, re.MULTILINE).group(1)
+        self.assertEqual(buckets[-1], int(count))
+
+
+class InlineEldLogTests(TestCase):
+    trip = {'current_location': 'Seattle, WA', 'pickup_location': 'Chicago, IL', 'dropoff_location': 'Miami, FL', 'cycle_used': 10}
+
+    def setUp(self):
+        previous = get_geocoder()
+        set_geocoder(StubGeocoder({'Seattle, WA': (47.61, -122.33), 'Chicago, IL': (41.88, -87.63), 'Miami, FL': (25.76, -80.19)}))
+        self.addCleanup(set_geocoder, previous)
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = media.name
+        media_settings = self.settings(MEDIA_ROOT=self.media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+    def eld_logs(self, eld_format):
+        response = self.client.post('/api/trip/', dict(self.trip, eld_format=eld_format), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['eld_logs']
+
+    def test_json_segments_cover_each_day(self):
+        logs = self.eld_logs('json')
+        self.assertGreater(len(logs), 2)
+        for day, log in enumerate(logs, 1):
+            self.assertEqual(log['day'], day)
+            self.assertNotIn('image', log)
+            segments = log['segments']
+            self.assertEqual([end for _, end, _ in segments[:-1]], [start for start, _, _ in segments[1:]])
+            self.assertTrue(all(0 <= start < end <= 24 and status in (OFF_DUTY, SLEEPER, DRIVING, ON_DUTY)
+                                for start, end, status in segments))
+            driving = sum(end - start for start, end, status in segments if status == DRIVING)
+            self.assertAlmostEqual(driving, log['drive_time'], places=2)
+        self.assertEqual(os.listdir(self.media_root), [])
+
+    def test_svg_draws_the_json_segments(self):
+        for log, segments in zip(self.eld_logs('svg'), [log['segments'] for log in self.eld_logs('json')]):
+            self.assertNotIn('image', log)
+            svg = ElementTree.fromstring(log['svg'])
+            namespace = '{http://www.w3.org/2000/svg}'
+            self.assertEqual(svg.find(f'{namespace}text').text, f"ELD Log - Day {log['day']}")
+            # The duty line steps to each segment's row, then runs to its end hour
+            steps = re.findall(r'V([\d.]+)H([\d.]+)', svg.findall(f'{namespace}path')[-1].get('d'))
+            self.assertEqual([3 - (int(y) - 38) // 28 for y, _ in steps], [status for _, _, status in segments])
+            np.testing.assert_allclose([(float(x) - 64) / 20 for _, x in steps], [end for _, end, _ in segments], atol=0.01)
+        self.assertEqual(os.listdir(self.media_root), [])
+
+    def test_unknown_format(self):
+        response = self.client.post('/api/trip/', dict(self.trip, eld_format='gif'), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('eld_format', response.json())
+
+
+class TripHistoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        Trip.objects.bulk_create([
+            Trip(current_location=f'Start {i}', pickup_location='Madison, WI', dropoff_location=f'Stop {i}', cycle_used=0)
+            for i in range(7)
+        ])
+        # Three trips share a timestamp, so pages have to break ties on id
+        created = datetime(2026, 3, 2, tzinfo=dt_timezone.utc)
+        for offset, trip in zip([0, 1, 1, 1, 2, 3, 4], Trip.objects.order_by('id')):
+            Trip.objects.filter(pk=trip.pk).update(created_at=created + timedelta(hours=offset))
+
+    def pages(self, **params):
+        ids, cursor = [], ''
+        while True:
+            response = self.client.get('/api/trip/history/', dict(params, cursor=cursor))
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            ids.append([row['trip_id'] for row in page['results']])
+            cursor = page['next_cursor']
+            if not cursor:
+                return ids
+
+    def test_pages_walk_every_trip_once(self):
+        expected = list(Trip.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        pages = self.pages(limit=2)
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+        self.assertEqual(sum(pages, []), expected)
+        self.assertEqual(sum(self.pages(limit=7), []), expected)
+
+    def test_filters(self):
+        since = datetime(2026, 3, 2, 1, tzinfo=dt_timezone.utc).isoformat()
+        self.assertEqual(sum(len(page) for page in self.pages(limit=2, since=since)), 6)
+        self.assertEqual(sum(self.pages(limit=2, location='stop 3'), []), [Trip.objects.get(dropoff_location='Stop 3').id])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/trip/history/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.json())
+
+
+class TripArtifactTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media = tempfile.TemporaryDirectory()
+        cls.enterClassContext(override_settings(MEDIA_ROOT=cls.media.name))
+        cls.addClassCleanup(cls.media.cleanup)
+
+    def setUp(self):
+        previous = get_geocoder()
+        set_geocoder(StubGeocoder())
+        self.addCleanup(set_geocoder, previous)
+        response = self.client.post('/api/trip/', {
+            'current_location': 'Chicago, IL', 'pickup_location': 'Madison, WI',
+            'dropoff_location': 'Denver, CO', 'cycle_used': 10, 'eld_format': 'json',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.trip = response.json()
+
+    def test_conditional_requests(self):
+        url = self.trip['daily_logs'][0]['pdf']
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        etag = response['ETag']
+        self.assertFalse(response.has_header('Last-Modified'))
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Only the ETag validates: the trip's age does not cover a new RENDER_VERSION
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT').status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+        # Each day has its own validator
+        if len(self.trip['daily_logs']) > 1:
+            self.assertNotEqual(self.client.get(self.trip['daily_logs'][1]['pdf'])['ETag'], etag)
+
+    def test_missing_day(self):
+        url = f"/api/trip/{self.trip['trip_id']}/logs/{len(self.trip['daily_logs']) + 1}.pdf"
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+_PDF_TOKEN = re.compile(rb'\((?:\\.|[^\\)])*\)|/[^\s/\[\]()]+|[-+]?(?:\d+\.?\d*|\.\d+)|[A-Za-z*\'"]+|\S')
+
+
+def _page_marks(content, forms):
+    """Text ``(string, x, y, size)`` and blue stroke segments of a PDF content stream, in page coordinates.
+
+    Follows ``q``/``Q``/``cm`` and the text matrix, and draws form XObjects from ``forms`` (name -> stream).
+    """
+    texts, lines = set(), set()
+    state = {'ctm': (1, 0, 0, 1, 0, 0), 'blue': False}
+    stack, operands = [], []
+    text = {'tm': (0, 0), 'line': (0, 0), 'leading': 0, 'size': 0}
+    point = None
+
+    def to_page(x, y):
+        a, b, c, d, e, f = state['ctm']
+        return round(a * x + c * y + e, 2), round(b * x + d * y + f, 2)
+
+    def run(stream):
+        nonlocal point
+        for token in _PDF_TOKEN.findall(stream):
+            if token[:1] in b'(/' or re.fullmatch(rb'[-+]?(?:\d+\.?\d*|\.\d+)', token):
+                operands.append(token)
+                continue
+            op, args = token.decode(), operands[:]
+            operands.clear()
+            numbers = [float(arg) for arg in args if arg[:1] not in b'(/']
+            if op == 'q':
+                stack.append(dict(state))
+            elif op == 'Q':
+                state.update(stack.pop())
+            elif op == 'cm':
+                a, b, c, d, e, f = numbers
+                A, B, C, D, E, F = state['ctm']
+                state['ctm'] = (a * A + b * C, a * B + b * D, c * A + d * C, c * B + d * D, e * A + f * C + E, e * B + f * D + F)
+            elif op == 'RG':
+                state['blue'] = numbers == [0, 0, 1]
+            elif op == 'Tf':
+                text['size'] = numbers[-1]
+            elif op == 'TL':
+                text['leading'] = numbers[0]
+            elif op == 'BT':
+                text['tm'] = text['line'] = (0, 0)
+            elif op == 'Tm':
+                text['tm'] = text['line'] = tuple(numbers[4:6])
+            elif op == 'Td':
+                text['tm'] = text['line'] = (text['line'][0] + numbers[0], text['line'][1] + numbers[1])
+            elif op == 'T*':
+                text['tm'] = text['line'] = (text['line'][0], text['line'][1] - text['leading'])
+            elif op == 'Tj':
+                string = re.sub(rb'\\(.)', rb'\1', args[-1][1:-1]).decode('latin-1')
+                texts.add((string, *to_page(*text['tm']), text['size']))
+            elif op == 'm':
+                point = to_page(*numbers)
+            elif op == 'l':
+                end = to_page(*numbers)
+                if state['blue']:
+                    lines.add(tuple(sorted([point, end])))
+                point = end
+            elif op == 'Do':
+                run(forms[args[-1].decode()[1:]])
+
+    run(content)
+    return texts, lines
+
+
+class LogSheetTemplateTests(SimpleTestCase):
+    def pages(self, render):
+        pages = []
+
+        class RecordingCanvas(Canvas):
+            def showPage(self):
+                pages.append('\n'.join(self._code).encode('latin-1'))
+                super().showPage()
+
+        render(RecordingCanvas)
+        return pages
+
+    def test_template_page_matches_the_platypus_page(self):
+        template = get_log_sheet_template()
+        forms = {f'FormXob.{FORM_NAME}': zlib.decompress(template._stream)}
+        segments = [(0, 6.5, 0), (6.5, 11.25, 2), (11.25, 12, 3), (12, 22, 1), (22, 24, 0)]
+
+        def render_template(canvas_class):
+            canvas = canvas_class(io.BytesIO(), pagesize=letter)
+            template.install(canvas)
+            template.draw_page(canvas, 3, 412.5, segments)
+
+        def render_platypus(canvas_class):
+            doc = SimpleDocTemplate(
+                io.BytesIO(), pagesize=letter, leftMargin=MARGIN, rightMargin=MARGIN, topMargin=MARGIN, bottomMargin=MARGIN,
+            )
+            doc.build(build_log_sheet_story(3, 412.5, segments), canvasmaker=canvas_class)
+
+        [expected], [page] = self.pages(render_platypus), self.pages(render_template)
+        texts, lines = _page_marks(page, forms)
+        expected_texts, expected_lines = _page_marks(expected, forms)
+        self.assertEqual(texts, expected_texts)
+        self.assertEqual(lines, expected_lines)
+        # The per-day fields are among them
+        self.assertTrue({'March 19, 2025', '412.5', 'Trip from Chicago to Madison, Day 3'} <= {text[0] for text in texts})
+        self.assertEqual(len(lines), 9)
+
+
+class RenderPoolTests(SimpleTestCase):
+    def test_logs_render_in_day_order_under_the_current_media_root(self):
+        timeline = plan_trip([[1800, 1]], start_hour=6)
+        days = len(day_totals(timeline)[0])
+        for _ in range(2):
+            # The pool outlives override_settings; each task carries the root to write under
+            with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+                ready = []
+                daily_logs, eld_logs = render_trip_logs(7, timeline, on_artifact=lambda kind, log: ready.append(kind))
+                self.assertEqual([log['day'] for log in daily_logs], list(range(1, days + 1)))
+                self.assertEqual([log['day'] for log in eld_logs], list(range(1, days + 1)))
+                self.assertEqual(daily_logs[0]['pdf'], '/api/trip/7/logs/1.pdf')
+                self.assertEqual(sorted(ready), ['daily_logs'] * days + ['eld_logs'] * days)
+                key = artifacts.artifact_key(timeline)
+                for day in range(1, days + 1):
+                    self.assertTrue(os.path.exists(artifacts.artifact_path('daily_logs', key, day)))
+                    self.assertTrue(os.path.exists(artifacts.artifact_path('eld_logs', key, day)))
+
+
+class RenderJobTests(TransactionTestCase):
+    # Jobs run on the job executor's threads, which only see committed rows
+
+    def setUp(self):
+        previous = get_geocoder()
+        set_geocoder(StubGeocoder())
+        self.addCleanup(set_geocoder, previous)
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = self.settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def plan(self):
+        response = self.client.post('/api/trip/?async=1', {
+            'current_location': 'Chicago, IL', 'pickup_location': 'Madison, WI',
+            'dropoff_location': 'Denver, CO', 'cycle_used': 10,
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        return response.json()
+
+    def test_progress_until_done(self):
+        result = self.plan()
+        self.assertEqual((result['daily_logs'], result['eld_logs']), ([], []))
+        deadline = time.monotonic() + 60
+        while True:
+            status = self.client.get(result['job']['status_url']).json()
+            self.assertLessEqual(status['completed_artifacts'], status['total_artifacts'])
+            if status['status'] not in ('pending', 'running') or time.monotonic() > deadline:
+                break
+            time.sleep(0.05)
+        self.assertEqual(status['status'], 'done')
+        self.assertEqual(status['completed_artifacts'], status['total_artifacts'])
+        days = status['total_artifacts'] // 2
+        self.assertEqual([log['day'] for log in status['daily_logs']], list(range(1, days + 1)))
+        self.assertEqual([log['day'] for log in status['eld_logs']], list(range(1, days + 1)))
+
+    def test_failures_are_recorded_on_the_job(self):
+        trip = Trip.objects.create(current_location='a', pickup_location='b', dropoff_location='c', cycle_used=0)
+        job = RenderJob.objects.create(trip=trip, total_artifacts=2)
+        with mock.patch('eld_trips.jobs.render_trip_logs', side_effect=RuntimeError("disk full")), \
+                self.assertLogs('eld_trips.jobs', 'ERROR'):
+            run_render_job(job.pk, plan_trip([[100, 1]]))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ('failed', "disk full"))
+
+        # An exception before rendering starts is recorded too
+        job = RenderJob.objects.create(trip=trip, total_artifacts=2)
+        with mock.patch.object(RenderJob, 'save', side_effect=RuntimeError("database is locked")), \
+                self.assertLogs('eld_trips.jobs', 'ERROR'):
+            run_render_job(job.pk, plan_trip([[100, 1]]))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ('failed', "database is locked"))
+        with self.assertLogs('eld_trips.jobs', 'ERROR'):
+            run_render_job(job.pk + 1, plan_trip([[100, 1]]))  # a missing job is logged, not raised
+
+    def test_stale_jobs_are_failed_when_polled(self):
+        trip = Trip.objects.create(current_location='a', pickup_location='b', dropoff_location='c', cycle_used=0)
+        job = RenderJob.objects.create(trip=trip, total_artifacts=2, status='running')
+        url = f'/api/trip/jobs/{job.pk}/'
+        self.assertEqual(self.client.get(url).json()['status'], 'running')
+        RenderJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        status = self.client.get(url).json()
+        self.assertEqual(status['status'], 'failed')
+        self.assertTrue(status['error'])
@@ -3,4 +3,15 @@ from . import views
 
 urlpatterns = [
     path('', views.trip_api, name='trip_api'),
-]
\ No newline at end of file
+    path('async/', views.trip_async_api, name='trip_async_api'),
+    path('multistop/', views.multistop_trip_api, name='multistop_trip_api'),
+    path('batch/', views.trip_batch_api, name='trip_batch_api'),
+    path('history/', views.trip_history_api, name='trip_history_api'),
+    path('<int:trip_id>/logs.pdf', views.trip_log_pdf, name='trip_log_pdf'),
+    path('<int:trip_id>/logs/<int:day>.pdf', views.trip_artifact, {'kind': 'daily_logs'}, name='trip_daily_log'),
+    path('<int:trip_id>/eld/<int:day>.png', views.trip_artifact, {'kind': 'eld_logs'}, name='trip_eld_log'),
+    path('jobs/<int:job_id>/', views.render_job_status, name='render_job_status'),
+    path('drivers/', views.driver_api, name='driver_api'),
+    path('drivers/<int:driver_id>/duty/', views.driver_duty_api, name='driver_duty_api'),
+    path('drivers/<int:driver_id>/cycle/', views.driver_cycle_api, name='driver_cycle_api'),
+]
@@ -3,4 +3,4 @@ cd trip-planner-frontend && npm install && npm run build && cd ..
 cp -r trip-planner-frontend/dist/* .
 python manage.py collectstatic --noinput
 python manage.py migrate
-gunicorn --bind 0.0.0.0:8000 trip_planner.wsgi:application
\ No newline at end of file
+gunicorn --bind 0.0.0.0:8000 --worker-class uvicorn.workers.UvicornWorker trip_planner.asgi:application
\ No newline at end of file
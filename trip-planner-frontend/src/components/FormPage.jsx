@@ -14,6 +14,43 @@ L.Icon.Default.mergeOptions({
   shadowUrl: 'https://unpkg.com/leaflet@1.9.4/dist/images/marker-shadow.png',
 });
 
+// Rows of the ELD chart, bottom to top, indexed by duty status code
+const DUTY_STATUSES = ['Off Duty', 'Sleeper', 'Driving', 'On Duty'];
+
+// Step chart of one day's [start, end, status] segments, drawn from the API's JSON
+function EldChart({ day, segments }) {
+  const left = 64, top = 24, hour = 20, row = 28;
+  const width = left + 24 * hour + 8;
+  const height = top + DUTY_STATUSES.length * row + 20;
+  const x = (h) => left + h * hour;
+  const y = (status) => top + (DUTY_STATUSES.length - 1 - status) * row + row / 2;
+  const path = segments.length
+    ? `M${x(segments[0][0])} ${y(segments[0][2])}` +
+      segments.map(([, end, status]) => `V${y(status)}H${x(end)}`).join('')
+    : '';
+
+  return (
+    <svg viewBox={`0 0 ${width} ${height}`} className="mt-2 w-full" fontFamily="sans-serif" fontSize="11">
+      <text x={width / 2} y="15" textAnchor="middle">ELD Log - Day {day}</text>
+      <g stroke="#ccc" strokeWidth="0.5">
+        {Array.from({ length: 25 }, (_, h) => (
+          <line key={`h${h}`} x1={x(h)} y1={top} x2={x(h)} y2={top + DUTY_STATUSES.length * row} />
+        ))}
+        {Array.from({ length: DUTY_STATUSES.length + 1 }, (_, r) => (
+          <line key={`r${r}`} x1={left} y1={top + r * row} x2={x(24)} y2={top + r * row} />
+        ))}
+      </g>
+      {DUTY_STATUSES.map((name, status) => (
+        <text key={name} x={left - 4} y={y(status) + 4} textAnchor="end">{name}</text>
+      ))}
+      {Array.from({ length: 13 }, (_, i) => (
+        <text key={i} x={x(i * 2)} y={height - 6} textAnchor="middle">{i * 2}</text>
+      ))}
+      <path d={path} fill="none" stroke="#1f77b4" strokeWidth="2" />
+    </svg>
+  );
+}
+
 function FormPage() {
   const [formData, setFormData] = useState({
     current_location: '',
@@ -37,7 +74,7 @@ function FormPage() {
     setError(null);
     setResult(null);
     try {
-      const response = await axios.post(`${baseUrl}/api/trip/`, formData);
+      const response = await axios.post(`${baseUrl}/api/trip/`, { ...formData, eld_format: 'json' });
         setLoading(false);
       setResult(response.data);
     } catch (err) {
@@ -158,7 +195,7 @@ function FormPage() {
                   url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"
                   attribution='© <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a>'
                 />
-                <Polyline positions={result.coordinates} color="blue" />
+                <Polyline positions={result.path || result.coordinates} color="blue" />
                 {result.coordinates.map((coord, idx) => (
                   <Marker key={idx} position={coord}>
                     <Popup>{idx === 0 ? 'Start' : idx === 1 ? 'Pickup' : 'Dropoff'}</Popup>
@@ -177,11 +214,15 @@ function FormPage() {
                     <p>Distance: {log.distance.toFixed(1)} miles</p>
                     <p>Drive Time: {log.drive_time.toFixed(1)} hours</p>
                     <p>Total Time: {log.total_time.toFixed(1)} hours</p>
-                    <img
-                      src={`${baseUrl}${log.image}`}
-                      alt={`ELD Log Day ${log.day}`}
-                      className="mt-2 w-full rounded-md"
-                    />
+                    {log.segments ? (
+                      <EldChart day={log.day} segments={log.segments} />
+                    ) : (
+                      <img
+                        src={`${baseUrl}${log.image}`}
+                        alt={`ELD Log Day ${log.day}`}
+                        className="mt-2 w-full rounded-md"
+                      />
+                    )}
                   </div>
                 ))}
                 
@@ -195,6 +236,13 @@ function FormPage() {
                     >
                       Download Daily Log (Day {log.day})
                     </a>))}
+              <a
+                href={`${baseUrl}/api/trip/${result.trip_id}/logs.pdf`}
+                download={`daily_log_${result.trip_id}.pdf`}
+                className="mt-2 ml-2 inline-block bg-blue-700 text-white px-4 py-2 rounded-md hover:bg-blue-800 transition-all"
+              >
+                Download All Daily Logs
+              </a>
             </div>
           </div>
         )}
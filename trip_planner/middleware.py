@@ -1,12 +1,100 @@
 import os
+import random
+import time
+
+import whitenoise.middleware
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+from eld_trips import metrics
+
 
 class XFrameOptionsMiddleware:
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        response = self.get_response(request)
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
         # Allow framing from localhost:3000 during development
         if os.getenv('DEBUG', 'False') == 'True' and request.get_host() == 'localhost:8000':
             response['X-Frame-Options'] = 'ALLOW-FROM http://localhost:3000'
-        return response
\ No newline at end of file
+        return response
+
+
+class TimingMiddleware:
+    """Request latency histogram for every request; phase timings for a sampled share."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started, token = self.start()
+        return self.finish(request, self.get_response(request), started, token)
+
+    async def __acall__(self, request):
+        started, token = self.start()
+        return self.finish(request, await self.get_response(request), started, token)
+
+    def start(self):
+        token = None
+        if random.random() < getattr(settings, 'METRICS_SAMPLE_RATE', 1.0):
+            token = metrics.start_request()
+        return time.perf_counter(), token
+
+    def finish(self, request, response, started, token):
+        if token is not None:
+            metrics.finish_request(token, request, response)
+        route = request.resolver_match.route if request.resolver_match else ''
+        metrics.REQUEST_SECONDS.observe(
+            time.perf_counter() - started, method=request.method, route=route, status=response.status_code
+        )
+        return response
+
+
+class WhiteNoiseMiddleware(whitenoise.middleware.WhiteNoiseMiddleware):
+    """WhiteNoise that also runs natively under ASGI.
+
+    Stock WhiteNoise is sync-only, which makes Django run every request's
+    middleware chain through a thread. Here only static file hits do.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
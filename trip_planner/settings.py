@@ -23,8 +23,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'trip_planner.middleware.TimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'trip_planner.middleware.WhiteNoiseMiddleware',  # async-capable WhiteNoise
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -59,6 +60,19 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # WAL lets readers run alongside the one writer; NORMAL sync is safe with WAL
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; PRAGMA cache_size=-20000; PRAGMA mmap_size=134217728',
+            # Writers take the lock up front and wait up to ``timeout`` seconds for it, instead of failing mid-transaction
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+    }
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
@@ -100,4 +114,60 @@ CORS_ALLOW_ALL_ORIGINS = True  # For development; restrict in production
 X_FRAME_OPTIONS = 'SAMEORIGIN'
 
 # Default primary key field type
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Geocoding
+GEOCODER = os.getenv('GEOCODER', 'nominatim')  # 'stub' for offline/deterministic coordinates
+GEOCODE_CACHE_SIZE = 1024  # in-process LRU entries
+GEOCODE_CACHE_TTL = 30 * 24 * 3600  # seconds
+GEOCODE_NEGATIVE_TTL = 3600  # seconds to remember failed lookups
+GEOCODE_TIMEOUT = 10  # seconds for all of a request's lookups together
+GEOCODER_STUB_LATENCY = float(os.getenv('GEOCODER_STUB_LATENCY', '0'))  # injected delay for benchmarks
+GAZETTEER_PATH = os.getenv('GAZETTEER_PATH', str(BASE_DIR / 'data' / 'gazetteer.sqlite3'))  # built by manage.py build_gazetteer; tried first when present
+GAZETTEER_MIN_SIMILARITY = 0.85  # for fuzzy gazetteer matches, 0..1
+
+# Background log rendering
+RENDER_JOB_WORKERS = int(os.getenv('RENDER_JOB_WORKERS', '2'))  # concurrent background jobs per app worker
+RENDER_JOB_STALE_AFTER = 600  # seconds without progress before a pending or running job is reported failed (e.g. after a restart)
+RENDER_MAX_WORKERS = int(os.getenv('RENDER_MAX_WORKERS', '0')) or None  # render processes; None = min(4, cpu count)
+ELD_LOG_FORMAT = os.getenv('ELD_LOG_FORMAT', 'png')  # default ELD log output: png, svg or json
+ARTIFACT_CACHE_MAX_BYTES = int(os.getenv('ARTIFACT_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))  # daily_logs + eld_logs + trip_logs
+ARTIFACT_RESCAN_INTERVAL = 300  # seconds between full scans of the artifact directories; other processes' writes show up then
+ARTIFACT_MAX_AGE = 3600  # seconds clients may reuse a log artifact before revalidating its ETag
+
+# Batch trip planning
+TRIP_BATCH_MAX_SIZE = 1000
+TRIP_BATCH_CONCURRENCY = 4  # geocode lookups, and trips being routed, at once per batch
+GEOCODE_BATCH_TIMEOUT = 120  # seconds for all of a batch's lookups together
+
+# Trip history
+TRIP_HISTORY_PAGE_SIZE = 50
+TRIP_HISTORY_MAX_PAGE_SIZE = 200
+TRIP_HISTORY_CACHE_TTL = 5  # seconds a trip history page is served from cache
+
+# Hours of service
+HOS_START_HOUR = 6  # hour of day 1 at which the driver comes on duty
+
+# Routing
+DISTANCE_METHOD = os.getenv('DISTANCE_METHOD', 'haversine')  # 'geodesic' for exact (slow) ellipsoidal distances
+TRIP_MAX_STOPS = 50  # intermediate stops per trip
+ROUTE_OPTIMIZE_TIME_BUDGET = 0.5  # seconds of local search when ordering multi-stop trips
+ROUTING_BACKEND = os.getenv('ROUTING_BACKEND', 'straight_line')  # 'road_graph' to route over ROAD_GRAPH_PATH
+ROAD_GRAPH_PATH = os.getenv('ROAD_GRAPH_PATH', str(BASE_DIR / 'data' / 'road_graph'))  # built by manage.py build_road_graph
+ROAD_GRAPH_SNAP_MILES = 25  # stops further than this from the graph are routed in a straight line
+ROAD_GRAPH_MAX_EXPANSIONS = 200000  # A* nodes settled per leg before falling back to the straight-line estimate
+ROUTE_PATH_MAX_POINTS = 500  # per leg, in the route returned to the map
+
+# Instrumentation
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', '1.0'))  # share of requests with phase timings, 0..1
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'eld_trips.timing': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
@@ -15,15 +15,15 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
-from django.conf import settings
-from django.conf.urls.static import static
 from django.views.generic import TemplateView
 from django.urls import path, include
+from eld_trips.views import metrics
 
 urlpatterns = [
     path('api/trip/', include('eld_trips.urls')),  # API endpoint
+    path('metrics', metrics, name='metrics'),  # Prometheus text format
     path('', TemplateView.as_view(template_name="index.html")),  # Serve index.html directly
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+]
 
 urlpatterns += [
     path('<path:path>', TemplateView.as_view(template_name="index.html")),